@@ -10,10 +10,15 @@ export interface AnomalyResult {
   processingTimeMs: number;
 }
 
+// Cooldown entries kept before expired ones are pruned
+const MAX_COOLDOWN_ENTRIES = 10000;
+
 export class FactHandler {
   private engine: Engine;
   private readonly logger: Console;
   private database: IDatabaseService;
+  // "<event type>:<source>" -> time (ms) until which the event is suppressed
+  private cooldowns: Map<string, number> = new Map();
 
   constructor(rules: Rule[] = [], database: IDatabaseService) {
     this.engine = new Engine(rules);
@@ -41,13 +46,15 @@ export class FactHandler {
       // Create structured result
       const anomalyResult: AnomalyResult = {
         fact,
-        anomalies: results.events,
+        anomalies: results.events.filter((event) =>
+          this.passesCooldown(fact.source, event)
+        ),
         processedAt: new Date(),
         processingTimeMs: processingTime,
       };
 
       // Handle results based on findings
-      if (results.events.length > 0) {
+      if (anomalyResult.anomalies.length > 0) {
         await this.handleAnomalies(anomalyResult);
       } else {
         this.logger.log(
@@ -77,6 +84,38 @@ export class FactHandler {
     }
   }
 
+  /**
+   * Rules with a `cooldown_sec` event param fire at most once per source
+   * within that many seconds, e.g. conditions on sliding-window values that
+   * stay true for every fact until the window moves on.
+   */
+  private passesCooldown(source: string, event: Event): boolean {
+    const cooldownSec = Number(event.params?.cooldown_sec ?? 0);
+    if (!(cooldownSec > 0)) {
+      return true;
+    }
+
+    const now = Date.now();
+    const key = `${event.type}:${source}`;
+    const until = this.cooldowns.get(key);
+    if (until !== undefined && now < until) {
+      this.logger.log(
+        `🔕 ${event.type} for ${source} suppressed (cooldown ${cooldownSec}s)`
+      );
+      return false;
+    }
+
+    if (this.cooldowns.size >= MAX_COOLDOWN_ENTRIES) {
+      for (const [entry, expiry] of this.cooldowns) {
+        if (expiry <= now) {
+          this.cooldowns.delete(entry);
+        }
+      }
+    }
+    this.cooldowns.set(key, now + cooldownSec * 1000);
+    return true;
+  }
+
   private async handleAnomalies(result: AnomalyResult): Promise<void> {
     const { fact, anomalies, processingTimeMs } = result;
 
@@ -17,4 +17,9 @@ export type Fact = {
   potential_scraper?: boolean;       // default false
 
   performance_latency?: number | null; // float or null
+  latency_p50?: number | null;         // sliding-window percentiles per source
+  latency_p95?: number | null;
+  latency_p99?: number | null;
+
+  coalesced_count?: number;          // number of logs summarized by this fact, default 1
 }
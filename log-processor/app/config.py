@@ -1,9 +1,6 @@
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
-
 
 class Settings(BaseSettings):
     # PostgreSQL
@@ -12,16 +9,132 @@ class Settings(BaseSettings):
     postgres_db: str
     postgres_port: int
     postgres_host: str = "localhost"  # optional with default
+    postgres_pool_min_size: int = 5  # connections opened (pre-warmed) at startup
+    postgres_pool_max_size: int = 10
+    postgres_connect_timeout_sec: float = 5.0
+    postgres_command_timeout_sec: float = 30.0
+    log_template_compression: bool = False
+
+    # Replay deduplication
+    dedup_enabled: bool = True
+    dedup_bloom_capacity: int = 1_000_000
+    dedup_bloom_error_rate: float = 0.001
+    dedup_seed_hours: float = 24  # age of the stored offsets loaded into the filter at startup
+
+    # Log partitioning and retention
+    logs_partition_interval: str = "daily"  # daily or hourly
+    logs_partition_premake: int = 3
+    logs_partition_check_sec: int = 300
+    logs_retention_days: int = 0  # 0 keeps everything
+    logs_retention_mode: str = "drop"  # drop, detach or archive (export to Parquet, then drop)
+    logs_archive_dir: str = "archive"
+    logs_archive_batch_rows: int = 50000  # rows fetched and written per Parquet row group
+    logs_archive_compression: str = "zstd"  # zstd, snappy, gzip or none
+
+    # Per-minute rollups (logs_rollup_1m)
+    rollup_enabled: bool = True
+    rollup_flush_sec: float = 5.0
 
     # Kafka
     kafka_bootstrap_servers: str  # from KAFKA_CLUSTERS_0_BOOTSTRAPSERVERS
     kafka_topic_input: str
     kafka_topic_output: str
     kafka_group_id: str = "log_processor_group"
+    kafka_batch_max_records: int = 500
+    kafka_batch_timeout_ms: int = 100
+
+    # Adaptive batching (bounds for the batch size and linger time controller)
+    adaptive_batching_enabled: bool = True
+    batch_min_records: int = 10
+    batch_max_records: int = 5000
+    batch_min_linger_ms: int = 5
+    batch_max_linger_ms: int = 500
+    batch_target_latency_ms: float = 200.0
+    batch_lag_threshold: int = 10000
+
+    # Log input: kafka or file (tail a newline-delimited JSON file)
+    input_mode: str = "kafka"
+    file_input_path: str = "/var/log/vector/app_logs.json"
+    file_input_checkpoint: str = "file_input.checkpoint"
+    file_input_chunk_bytes: int = 8 * 1024 * 1024
+    file_input_replay: bool = False
+
+    # Per log_type parsers filling structured fields from raw nginx, journald and docker lines
+    log_parsers_enabled: bool = True
+    log_parser_cache_size: int = 10000  # cached request lines, time prefixes and syslog headers, per type
 
     # Redis
     redis_port: int = 6379
     redis_host: str = "localhost"
+    redis_pool_prewarm: int = 4  # connections opened at startup, per node
+    redis_nodes: str = ""  # e.g. "redis-1:6379,redis-2:6379", overrides host and port
+    redis_ring_vnodes: int = 160  # points per node on the consistent-hash ring
+    redis_cluster: bool = False  # first node is a Redis Cluster entry point
+
+    # Fact generation policy (patterns, windows and thresholds), reloaded on change
+    fact_policy_file: str = "fact_policy.json"
+    fact_policy_check_sec: float = 5.0  # 0 disables reloading
+
+    # Load shedding: under overload only high-priority log rows are stored right away
+    load_shedding_enabled: bool = False
+    load_shedding_lag_threshold: int = 100000  # consumer lag that starts overload, 0 ignores lag
+    load_shedding_queue_threshold: int = 0  # tenant queue depth that starts overload, 0 ignores it
+    load_shedding_mode: str = "sample"  # sample or defer (to the disk spool)
+    load_shedding_sample_rate: float = 0.1  # share of low-priority rows stored in sample mode
+
+    # Per-tenant fair scheduling of fact generation
+    tenant_scheduling_enabled: bool = False
+    tenant_quantum: int = 100  # logs per round for a tenant of weight 1
+    tenant_weights: str = ""  # e.g. "acme=3,globex=0.5", other tenants weigh 1
+    tenant_rate_limits: str = ""  # logs per second, e.g. "acme=500"
+    tenant_default_rate_limit: float = 0.0  # 0 means unlimited
+    tenant_max_pending: int = 20000  # intake waits above this many queued logs
+    tenant_queue_max_logs: int = 10000  # per tenant, new logs beyond it skip fact generation
+
+    # Startup
+    readiness_file: str = ""  # written once every client is warm (empty disables)
+
+    # Metrics and health endpoints
+    http_host: str = "0.0.0.0"
+    http_port: int = 8000  # 0 disables
+
+    # Live per-source window state served on /state/sources
+    window_state_enabled: bool = True
+    window_state_top_n: int = 10  # top templates and client addresses per source
+    window_state_max_sources: int = 50000  # least recently seen sources are dropped beyond it
+    window_state_publish_ms: float = 250.0  # interval between snapshots
+
+    # Diagnostics: event loop stall watchdog, sampling profiler, allocation snapshots
+    diagnostics_enabled: bool = False
+    diagnostics_dir: str = "diagnostics"
+    loop_stall_threshold_ms: float = 200.0
+    loop_stall_check_ms: float = 50.0
+    profile_duration_sec: float = 10.0
+    profile_sample_hz: int = 100
+    tracemalloc_frames: int = 1
+
+    # Logging
+    log_level: str = "INFO"
+    log_format: str = "text"  # text or json
+    log_rate_limit_per_sec: float = 10.0  # per message template, 0 disables
+    log_rate_limit_burst: int = 50
+    log_sample_rate: float = 1.0  # share of INFO/DEBUG records kept
+
+    # Local disk spool for sink outages
+    spool_enabled: bool = True
+    spool_dir: str = "spool"
+    spool_segment_bytes: int = 64 * 1024 * 1024
+    spool_max_bytes: int = 1024 * 1024 * 1024
+    spool_fsync: str = "interval"  # always, interval or never
+    spool_fsync_interval_sec: float = 1.0
+    spool_drain_interval_sec: float = 5.0
+    spool_drain_batch_size: int = 1000
+    spool_breaker_sec: float = 5.0  # after a failed insert, batches are spooled without trying the database
+
+    # Fact coalescing
+    fact_coalescing_enabled: bool = False
+    fact_coalescing_tick_sec: float = 1.0
+    fact_coalescing_rules_dir: str = ""  # anomaly-detector rules directory, built-in thresholds when empty
 
     model_config = {
         "env_file": ".env",
@@ -29,4 +142,27 @@ class Settings(BaseSettings):
     }
 
 
-settings = Settings()
+_settings = None
+
+
+def get_settings() -> Settings:
+    """Load the settings on first use rather than at import time"""
+    global _settings
+    if _settings is None:
+        # Load environment variables from .env file
+        load_dotenv()
+        _settings = Settings()
+    return _settings
+
+
+class _LazySettings:
+    """Stands in for the Settings instance so importing app.config has no side effects"""
+
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name, value):
+        setattr(get_settings(), name, value)
+
+
+settings = _LazySettings()
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.monitoring.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Arrow types of the Postgres column types found in the logs table, anything else is written as text
+ARROW_TYPES = {
+    "int2": pa.int16(),
+    "int4": pa.int32(),
+    "int8": pa.int64(),
+    "float4": pa.float32(),
+    "float8": pa.float64(),
+    "bool": pa.bool_(),
+    "timestamptz": pa.timestamp("us", tz="UTC"),
+    "timestamp": pa.timestamp("us"),
+    "text[]": pa.list_(pa.string()),
+    "int4[]": pa.list_(pa.int32()),
+}
+
+
+class LogArchiver:
+    """Exports expired log partitions to Parquet files before they are dropped.
+
+    Rows are read through a server-side cursor ``batch_rows`` at a time and
+    each batch is written as one row group, so memory use does not depend on
+    the partition size. Files are laid out by date
+    (``<directory>/date=2026-01-31/logs_p20260131.parquet``) and only moved
+    into place once the rows in the file match the partition row count.
+    """
+
+    def __init__(self, pool, directory: str, batch_rows: int, compression: str):
+        self.pool = pool
+        self.directory = directory
+        self.batch_rows = batch_rows
+        self.compression = compression
+
+        metrics.describe("log_processor_archived_rows_total", "Log rows exported to Parquet before their partition was dropped")
+        metrics.describe("log_processor_archived_partitions_total", "Log partitions exported to Parquet")
+        metrics.describe("log_processor_archive_ms", "Duration of the last partition export")
+
+    def path_for(self, name: str, start: datetime) -> str:
+        return os.path.join(self.directory, f"date={start:%Y-%m-%d}", f"{name}.parquet")
+
+    async def archive(self, name: str, start: datetime) -> int:
+        """Export a partition to its Parquet file and return the number of rows written.
+
+        Raises ValueError if the file does not hold every row of the partition.
+        """
+        path = self.path_for(name, start)
+        tmp_path = path + ".tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        started = time.monotonic()
+        writer = None
+        written = 0
+        try:
+            async with self.pool.acquire() as conn:
+                # The count and the export see the same snapshot of the partition
+                async with conn.transaction(isolation="repeatable_read", readonly=True):
+                    expected = await conn.fetchval(f"SELECT count(*) FROM {name}")
+                    stmt = await conn.prepare(f"SELECT * FROM {name}")
+                    schema = pa.schema([
+                        (attr.name, ARROW_TYPES.get(attr.type.name, pa.string())) for attr in stmt.get_attributes()
+                    ])
+                    writer = pq.ParquetWriter(tmp_path, schema, compression=self.compression)
+                    cursor = await stmt.cursor()
+                    while True:
+                        rows = await cursor.fetch(self.batch_rows)
+                        if not rows:
+                            break
+                        await asyncio.to_thread(self._write_batch, writer, schema, rows)
+                        written += len(rows)
+            writer.close()
+            writer = None
+
+            stored = await asyncio.to_thread(self._finish, tmp_path)
+            if not written == stored == expected:
+                raise ValueError(f"{name} has {expected} rows, exported {written}, file holds {stored}")
+        except BaseException:
+            if writer is not None:
+                writer.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        os.replace(tmp_path, path)
+        metrics.inc("log_processor_archived_rows_total", written)
+        metrics.inc("log_processor_archived_partitions_total")
+        metrics.set_gauge("log_processor_archive_ms", round((time.monotonic() - started) * 1000, 2))
+        logger.info("Archived %d rows of %s to %s", written, name, path)
+        return written
+
+    @staticmethod
+    def _write_batch(writer, schema: pa.Schema, rows: List) -> None:
+        columns: Dict[str, list] = {field.name: [] for field in schema}
+        text_columns = {field.name for field in schema if field.type == pa.string()}
+        for row in rows:
+            for column, value in row.items():
+                if value is not None and column in text_columns and not isinstance(value, str):
+                    value = str(value)
+                columns[column].append(value)
+        writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+
+    @staticmethod
+    def _finish(tmp_path: str) -> int:
+        """Flush the file to disk and read back the row count from its footer"""
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        return pq.ParquetFile(tmp_path).metadata.num_rows
@@ -0,0 +1,103 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from app.config import settings
+from app.db.partitions import _as_utc
+from app.models.log_model import LogModel
+from app.processors.bloom import RotatingBloomFilter
+
+logger = logging.getLogger(__name__)
+
+# Offsets read per round trip while seeding
+SEED_BATCH = 10000
+
+
+def origin_key(log: LogModel) -> str:
+    return f"{log.kafka_topic}:{log.kafka_partition}:{log.kafka_offset}"
+
+
+def has_origin(log: LogModel) -> bool:
+    return log.kafka_topic is not None and log.kafka_offset is not None
+
+
+class ReplayDeduplicator:
+    """Skips logs re-delivered after a rebalance or restart.
+
+    Every stored log is tagged with its (topic, partition, offset). A rotating
+    Bloom filter of recently stored offsets answers "definitely new" without
+    touching the database; only its probable hits are checked against the
+    logs table, in one query per batch.
+
+    The filter is seeded in the background after startup; until then every
+    log with an origin counts as a probable replay and is checked against
+    the table.
+    """
+
+    def __init__(self):
+        self.seen = RotatingBloomFilter(settings.dedup_bloom_capacity, settings.dedup_bloom_error_rate)
+        self.seeded = False
+
+    async def seed(self, conn):
+        """Load the offsets of the most recently stored logs of the last dedup_seed_hours"""
+        since = datetime.now(timezone.utc) - timedelta(hours=settings.dedup_seed_hours)
+        loaded = 0
+        # The timestamp bound keeps the scan to the newest partitions
+        async with conn.transaction(readonly=True):
+            cursor = await conn.cursor(
+                """
+                SELECT kafka_topic, kafka_partition, kafka_offset
+                FROM logs
+                WHERE kafka_offset IS NOT NULL AND timestamp >= $1
+                ORDER BY id DESC
+                LIMIT $2
+                """,
+                since,
+                settings.dedup_bloom_capacity,
+            )
+            while True:
+                rows = await cursor.fetch(SEED_BATCH)
+                if not rows:
+                    break
+                for row in rows:
+                    self.seen.add(f"{row['kafka_topic']}:{row['kafka_partition']}:{row['kafka_offset']}")
+                loaded += len(rows)
+        self.seeded = True
+        logger.info("Replay deduplication seeded with %d recent offsets", loaded)
+
+    async def filter_new(self, conn, logs: List[LogModel]) -> List[LogModel]:
+        if self.seeded:
+            probable = [log for log in logs if has_origin(log) and origin_key(log) in self.seen]
+        else:
+            probable = [log for log in logs if has_origin(log)]
+        if not probable:
+            return logs
+
+        # A replayed message carries the timestamp it was stored with, so only
+        # partitions covering the batch's time range need to be probed
+        timestamps = [_as_utc(log.timestamp) for log in probable]
+        rows = await conn.fetch(
+            """
+            SELECT l.kafka_topic, l.kafka_partition, l.kafka_offset
+            FROM logs l
+            JOIN unnest($1::text[], $2::int[], $3::bigint[]) AS k(topic, part, off)
+              ON l.kafka_topic = k.topic AND l.kafka_partition = k.part AND l.kafka_offset = k.off
+            WHERE l.timestamp BETWEEN $4 AND $5
+            """,
+            [log.kafka_topic for log in probable],
+            [log.kafka_partition for log in probable],
+            [log.kafka_offset for log in probable],
+            min(timestamps),
+            max(timestamps),
+        )
+        if not rows:
+            return logs
+
+        stored = {f"{row['kafka_topic']}:{row['kafka_partition']}:{row['kafka_offset']}" for row in rows}
+        logger.info("Skipping %d already stored logs (replayed offsets)", len(stored))
+        return [log for log in logs if not (has_origin(log) and origin_key(log) in stored)]
+
+    def remember(self, logs: List[LogModel]):
+        for log in logs:
+            if has_origin(log):
+                self.seen.add(origin_key(log))
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "logs_p"
+
+# Interval -> (partition length, name suffix format, name suffix pattern)
+INTERVALS = {
+    "daily": (timedelta(days=1), "%Y%m%d", re.compile(r"\d{8}")),
+    "hourly": (timedelta(hours=1), "%Y%m%d%H", re.compile(r"\d{10}")),
+}
+
+RETENTION_MODES = ("drop", "detach", "archive")
+
+
+def _as_utc(ts: datetime) -> datetime:
+    if ts.tzinfo is None:
+        return ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc)
+
+
+class PartitionManager:
+    """Creates range partitions of the logs table ahead of time and applies retention.
+
+    Partitions are named after the start of the interval they cover
+    (``logs_p20240131`` for daily, ``logs_p2024013113`` for hourly), so the
+    bounds of an existing partition can be read back from its name.
+    """
+
+    def __init__(self, pool):
+        if settings.logs_partition_interval not in INTERVALS:
+            raise ValueError(f"Unsupported partition interval: {settings.logs_partition_interval}")
+        if settings.logs_retention_mode not in RETENTION_MODES:
+            raise ValueError(f"Unsupported retention mode: {settings.logs_retention_mode}")
+        self.pool = pool
+        self.step, self.name_format, self.name_pattern = INTERVALS[settings.logs_partition_interval]
+        self.known: set = set()
+        self.archiver = None
+        if settings.logs_retention_mode == "archive":
+            # pyarrow is only needed when partitions are archived
+            from app.db.archiver import LogArchiver
+            self.archiver = LogArchiver(
+                pool,
+                settings.logs_archive_dir,
+                batch_rows=settings.logs_archive_batch_rows,
+                compression=settings.logs_archive_compression,
+            )
+
+    def bounds(self, ts: datetime) -> Tuple[datetime, datetime]:
+        ts = _as_utc(ts)
+        if self.step == timedelta(days=1):
+            start = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+        else:
+            start = ts.replace(minute=0, second=0, microsecond=0)
+        return start, start + self.step
+
+    def name(self, start: datetime) -> str:
+        return PARTITION_PREFIX + start.strftime(self.name_format)
+
+    async def ensure_for(self, timestamps: Iterable[datetime]):
+        """Create the partitions needed to hold the given timestamps"""
+        for start in {self.bounds(ts)[0] for ts in timestamps if ts is not None}:
+            await self._create(start)
+
+    async def ensure_ahead(self, now: datetime = None):
+        now = now or datetime.now(timezone.utc)
+        start, _ = self.bounds(now)
+        for i in range(settings.logs_partition_premake + 1):
+            await self._create(start + i * self.step)
+
+    async def _create(self, start: datetime):
+        name = self.name(start)
+        if name in self.known:
+            return
+        end = start + self.step
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF logs "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        self.known.add(name)
+        logger.info("Log partition ready: %s", name)
+
+    async def list_partitions(self) -> List[Tuple[str, datetime]]:
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT c.relname
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                JOIN pg_class p ON p.oid = i.inhparent
+                WHERE p.relname = 'logs'
+                """
+            )
+        partitions = []
+        for row in rows:
+            name = row["relname"]
+            suffix = name[len(PARTITION_PREFIX):]
+            # Not one of ours (or created with another interval); the width is checked first
+            # since strptime would read the daily logs_p20240131 as hourly 2024-01-03 01:00
+            if not name.startswith(PARTITION_PREFIX) or not self.name_pattern.fullmatch(suffix):
+                continue
+            try:
+                start = datetime.strptime(suffix, self.name_format)
+            except ValueError:
+                continue
+            partitions.append((name, start.replace(tzinfo=timezone.utc)))
+        return sorted(partitions, key=lambda p: p[1])
+
+    async def expired_partitions(self, now: datetime = None) -> List[Tuple[str, datetime]]:
+        """Partitions whose whole range is older than the retention period"""
+        if settings.logs_retention_days <= 0:
+            return []
+        now = now or datetime.now(timezone.utc)
+        cutoff = now - timedelta(days=settings.logs_retention_days)
+        return [(name, start) for name, start in await self.list_partitions() if start + self.step <= cutoff]
+
+    async def remove(self, name: str):
+        async with self.pool.acquire() as conn:
+            if settings.logs_retention_mode == "detach":
+                await conn.execute(f"ALTER TABLE logs DETACH PARTITION {name}")
+                logger.info("Detached expired log partition: %s", name)
+            else:
+                await conn.execute(f"DROP TABLE IF EXISTS {name}")
+                logger.info("Dropped expired log partition: %s", name)
+        self.known.discard(name)
+
+    async def drop_archived(self, name: str, archived_rows: int):
+        """Drop an archived partition, unless rows arrived since it was exported"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                # Late rows routed to the partition wait for the lock, then fail and create it again
+                await conn.execute(f"LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE")
+                rows = await conn.fetchval(f"SELECT count(*) FROM {name}")
+                if rows != archived_rows:
+                    logger.warning("%s changed during its export (%d -> %d rows), archiving it again next run", name, archived_rows, rows)
+                    return
+                await conn.execute(f"DROP TABLE {name}")
+        logger.info("Dropped archived log partition: %s", name)
+        self.known.discard(name)
+
+    async def enforce_retention(self, now: datetime = None):
+        for name, start in await self.expired_partitions(now):
+            if self.archiver:
+                await self.drop_archived(name, await self.archiver.archive(name, start))
+            else:
+                await self.remove(name)
+
+    async def run(self):
+        """Background task keeping partitions ahead of time and applying retention"""
+        while True:
+            try:
+                await self.ensure_ahead()
+                await self.enforce_retention()
+            except Exception as e:
+                logger.error("Partition maintenance failed: %s", e)
+            await asyncio.sleep(settings.logs_partition_check_sec)
@@ -1,38 +1,254 @@
+import asyncio
 import asyncpg
 import json
 import logging
-from dateutil.parser import isoparse
 from app.config import settings
-from app.models import log_model
+from typing import List
 from app.models.log_model import LogModel
+from app.db.dedup import ReplayDeduplicator
+from app.db.partitions import PartitionManager
+from app.db.rollups import RollupAggregator
+from app.processors.template_miner import TemplateMiner
 
-DB_CONFIG = {
-    "user": settings.postgres_user,
-    "password": settings.postgres_password,
-    "database": settings.postgres_db,
-    "host": settings.postgres_host,
-    "port": settings.postgres_port,
-}
+
+def db_config() -> dict:
+    return {
+        "user": settings.postgres_user,
+        "password": settings.postgres_password,
+        "database": settings.postgres_db,
+        "host": settings.postgres_host,
+        "port": settings.postgres_port,
+    }
 
 logger = logging.getLogger(__name__)
 
+# Number of stored templates loaded into the miner on startup
+TEMPLATE_PRELOAD_LIMIT = 10000
+
+LOGS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS logs (
+        id BIGSERIAL,
+        timestamp TIMESTAMPTZ NOT NULL,
+        source TEXT,
+        hostname TEXT,
+        log_level TEXT,
+        message TEXT,
+        event_type TEXT,
+        source_ip TEXT,
+        destination_ip TEXT,
+        user_id TEXT,
+        username TEXT,
+        http_method TEXT,
+        http_url TEXT,
+        http_status INTEGER,
+        user_agent TEXT,
+        tags TEXT[],
+        extra JSONB,
+        tenant TEXT NOT NULL DEFAULT 'default',
+        kafka_topic TEXT,
+        kafka_partition INTEGER,
+        kafka_offset BIGINT,
+        sample_weight REAL NOT NULL DEFAULT 1,
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp);
+
+    ALTER TABLE logs ADD COLUMN IF NOT EXISTS kafka_topic TEXT;
+    ALTER TABLE logs ADD COLUMN IF NOT EXISTS kafka_partition INTEGER;
+    ALTER TABLE logs ADD COLUMN IF NOT EXISTS kafka_offset BIGINT;
+    ALTER TABLE logs ADD COLUMN IF NOT EXISTS sample_weight REAL NOT NULL DEFAULT 1;
+
+    CREATE INDEX IF NOT EXISTS logs_source_timestamp_idx ON logs (source, timestamp);
+    CREATE INDEX IF NOT EXISTS logs_kafka_origin_idx ON logs (kafka_topic, kafka_partition, kafka_offset);
+"""
+
+TEMPLATE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS log_templates (
+        template_id BIGINT PRIMARY KEY,
+        template TEXT NOT NULL,
+        token_count INTEGER NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+
+    ALTER TABLE logs ADD COLUMN IF NOT EXISTS template_id BIGINT;
+    ALTER TABLE logs ADD COLUMN IF NOT EXISTS template_params TEXT[];
+
+    CREATE OR REPLACE FUNCTION render_log_template(template TEXT, params TEXT[])
+    RETURNS TEXT LANGUAGE plpgsql IMMUTABLE AS $$
+    DECLARE
+        tokens TEXT[] := string_to_array(template, ' ');
+        p INTEGER := 1;
+    BEGIN
+        IF template IS NULL THEN
+            RETURN NULL;
+        END IF;
+        FOR i IN 1 .. coalesce(array_length(tokens, 1), 0) LOOP
+            IF tokens[i] = '<*>' THEN
+                tokens[i] := params[p];
+                p := p + 1;
+            END IF;
+        END LOOP;
+        RETURN array_to_string(tokens, ' ');
+    END
+    $$;
+
+    -- Recreated rather than replaced: l.* picks up columns added to logs since
+    DROP VIEW IF EXISTS logs_expanded;
+    CREATE VIEW logs_expanded AS
+        SELECT l.*,
+               coalesce(l.message, render_log_template(t.template, l.template_params)) AS original_message
+        FROM logs l
+        LEFT JOIN log_templates t ON t.template_id = l.template_id;
+"""
+
+
+LOG_COLUMNS = [
+    "timestamp", "source", "hostname", "log_level", "message",
+    "event_type", "source_ip", "destination_ip", "user_id", "username",
+    "http_method", "http_url", "http_status", "user_agent",
+    "tags", "extra", "tenant",
+    "kafka_topic", "kafka_partition", "kafka_offset", "sample_weight",
+]
+TEMPLATE_COLUMNS = ["template_id", "template_params"]
+
 
 class Database:
     def __init__(self):
         self.pool = None
+        self.partitions = None
+        self.rollups = None
+        self.dedup = ReplayDeduplicator() if settings.dedup_enabled else None
+        self.dedup_task = None
+        self.template_miner = TemplateMiner() if settings.log_template_compression else None
+        self.columns = LOG_COLUMNS + (TEMPLATE_COLUMNS if self.template_miner else [])
 
     async def connect(self):
-        self.pool = await asyncpg.create_pool(**DB_CONFIG, min_size=1, max_size=10)
+        # min_size connections are opened here, so the first batch does not pay for them
+        self.pool = await asyncpg.create_pool(
+            **db_config(),
+            min_size=settings.postgres_pool_min_size,
+            max_size=settings.postgres_pool_max_size,
+            # Fail fast while the server is unreachable, failed batches go to the spool
+            timeout=settings.postgres_connect_timeout_sec,
+        )
+        await self._init_schema()
+        if self.dedup:
+            self.dedup_task = asyncio.create_task(self._seed_dedup())
+        if self.template_miner:
+            await self._init_templates()
+        if settings.rollup_enabled:
+            self.rollups = RollupAggregator(self.pool)
+            await self.rollups.init_schema()
+
+    async def _init_schema(self):
+        """Create the partitioned logs table and its upcoming partitions"""
+        async with self.pool.acquire() as conn:
+            await conn.execute(LOGS_SCHEMA)
+            partitioned = await conn.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'logs'::regclass)"
+            )
+        if not partitioned:
+            # Retention only ever drops whole partitions, it cannot apply to this table
+            if settings.logs_retention_days > 0:
+                raise RuntimeError(
+                    "LOGS_RETENTION_DAYS is set but the logs table is not partitioned, "
+                    "migrate it first (see Troubleshooting in the README)"
+                )
+            logger.warning("logs table is not partitioned, partition management disabled")
+            return
+        self.partitions = PartitionManager(self.pool)
+        await self.partitions.ensure_ahead()
+
+    async def _seed_dedup(self):
+        """Load recent offsets without holding up startup, batches are checked against the table meanwhile"""
+        try:
+            async with self.pool.acquire() as conn:
+                await self.dedup.seed(conn)
+        except Exception as e:
+            logger.error("Seeding replay deduplication failed, checking every log against the table: %s", e)
+
+    async def _init_templates(self):
+        """Create the template tables and load known templates into the miner"""
+        async with self.pool.acquire() as conn:
+            await conn.execute(TEMPLATE_SCHEMA)
+            rows = await conn.fetch(
+                "SELECT template FROM log_templates ORDER BY created_at DESC LIMIT $1",
+                TEMPLATE_PRELOAD_LIMIT,
+            )
+        for row in rows:
+            self.template_miner.add_template(row["template"])
+        logger.info("Template compression enabled, %d templates preloaded", len(rows))
 
     async def close(self):
+        if self.dedup_task:
+            self.dedup_task.cancel()
         if self.pool:
+            if self.rollups:
+                try:
+                    await self.rollups.flush()
+                except Exception as e:
+                    logger.error("Final rollup flush failed: %s", e)
             await self.pool.close()
 
     async def insert_log(self, log: LogModel):
+        await self.insert_logs([log])
+
+    async def insert_logs(self, logs: List[LogModel]) -> List[LogModel]:
+        """Bulk insert logs with COPY, creating missing partitions on demand.
+
+        Returns the logs that were stored, i.e. without already stored replays.
+        """
+        if self.dedup:
+            async with self.pool.acquire() as conn:
+                logs = await self.dedup.filter_new(conn, logs)
+            if not logs:
+                return logs
+
+        rows = []
+        new_templates = {}
+        for log in logs:
+            row, template = self._prepare_row(log)
+            rows.append(row)
+            if template and template.is_new:
+                new_templates[template.template_id] = template
+
+        async with self.pool.acquire() as conn:
+            if new_templates:
+                await conn.executemany(
+                    """
+                    INSERT INTO log_templates (template_id, template, token_count)
+                    VALUES ($1, $2, $3)
+                    ON CONFLICT (template_id) DO NOTHING
+                    """,
+                    [(t.template_id, t.template, len(t.template.split(" "))) for t in new_templates.values()],
+                )
+                for template_id in new_templates:
+                    self.template_miner.mark_known(template_id)
+
+            try:
+                await conn.copy_records_to_table(
+                    "logs", records=rows, columns=self.columns, timeout=settings.postgres_command_timeout_sec
+                )
+            except asyncpg.exceptions.CheckViolationError:
+                # No partition covers some of the rows yet (e.g. late or future timestamps)
+                if not self.partitions:
+                    raise
+                await self.partitions.ensure_for(row[0] for row in rows)
+                await conn.copy_records_to_table(
+                    "logs", records=rows, columns=self.columns, timeout=settings.postgres_command_timeout_sec
+                )
+
+        if self.dedup:
+            self.dedup.remember(logs)
+        if self.rollups:
+            self.rollups.add(logs)
+        return logs
+
+    def _prepare_row(self, log: LogModel):
 
         # Safe timestamp handling
         ts = log.timestamp
         if isinstance(ts, str):
+            from dateutil.parser import isoparse
             ts = isoparse(ts)
         elif ts is None:
             logger.error("timestamp is null")
@@ -41,36 +257,40 @@ class Database:
         extra = log.extra
         if isinstance(extra, dict):
             extra = json.dumps(extra)
-        query = """
-            INSERT INTO logs (
-                timestamp, source, hostname, log_level, message,
-                event_type, source_ip, destination_ip, user_id, username,
-                http_method, http_url, http_status, user_agent,
-                tags, extra, tenant
-            ) VALUES (
-                $1, $2, $3, $4, $5,
-                $6, $7, $8, $9, $10,
-                $11, $12, $13, $14,
-                $15, $16, $17
-            )
-        """
-        async with self.pool.acquire() as conn:
-            await conn.execute(query,
-                ts,
-                log.source,
-                log.hostname,
-                log.log_level,
-                log.message,
-                log.event_type,
-                log.source_ip,
-                log.destination_ip,
-                log.user_id,
-                log.username,
-                log.http_method,
-                log.http_url,
-                log.http_status,
-                log.user_agent,
-                log.tags,
-                extra,
-                log.tenant or "default",
-            )
\ No newline at end of file
+
+        # Store template id and parameters instead of the full message
+        message = log.message
+        template = self.template_miner.match(message) if self.template_miner else None
+        template_id = template_params = None
+        if template:
+            message = None
+            log._template = template.template
+            template_id = template.template_id
+            template_params = template.params
+
+        row = [
+            ts,
+            log.source,
+            log.hostname,
+            log.log_level,
+            message,
+            log.event_type,
+            log.source_ip,
+            log.destination_ip,
+            log.user_id,
+            log.username,
+            log.http_method,
+            log.http_url,
+            log.http_status,
+            log.user_agent,
+            log.tags,
+            extra,
+            log.tenant or "default",
+            log.kafka_topic,
+            log.kafka_partition,
+            log.kafka_offset,
+            log.sample_weight,
+        ]
+        if self.template_miner:
+            row += [template_id, template_params]
+        return tuple(row), template
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from app.config import settings
+from app.models.log_model import LogModel
+from app.monitoring.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS logs_rollup_1m (
+        tenant TEXT NOT NULL,
+        source TEXT NOT NULL,
+        log_level TEXT NOT NULL,
+        minute TIMESTAMPTZ NOT NULL,
+        log_count BIGINT NOT NULL DEFAULT 0,
+        status_2xx BIGINT NOT NULL DEFAULT 0,
+        status_3xx BIGINT NOT NULL DEFAULT 0,
+        status_4xx BIGINT NOT NULL DEFAULT 0,
+        status_5xx BIGINT NOT NULL DEFAULT 0,
+        latency_count BIGINT NOT NULL DEFAULT 0,
+        latency_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        latency_max DOUBLE PRECISION,
+        PRIMARY KEY (tenant, source, log_level, minute)
+    );
+
+    CREATE INDEX IF NOT EXISTS logs_rollup_1m_minute_idx ON logs_rollup_1m (minute);
+"""
+
+# One row per flush key, the arrays are unnested server side
+UPSERT_QUERY = """
+    INSERT INTO logs_rollup_1m AS r (
+        tenant, source, log_level, minute, log_count,
+        status_2xx, status_3xx, status_4xx, status_5xx,
+        latency_count, latency_sum, latency_max
+    )
+    SELECT * FROM unnest(
+        $1::text[], $2::text[], $3::text[], $4::timestamptz[], $5::bigint[],
+        $6::bigint[], $7::bigint[], $8::bigint[], $9::bigint[],
+        $10::bigint[], $11::float8[], $12::float8[]
+    )
+    ON CONFLICT (tenant, source, log_level, minute) DO UPDATE SET
+        log_count = r.log_count + EXCLUDED.log_count,
+        status_2xx = r.status_2xx + EXCLUDED.status_2xx,
+        status_3xx = r.status_3xx + EXCLUDED.status_3xx,
+        status_4xx = r.status_4xx + EXCLUDED.status_4xx,
+        status_5xx = r.status_5xx + EXCLUDED.status_5xx,
+        latency_count = r.latency_count + EXCLUDED.latency_count,
+        latency_sum = r.latency_sum + EXCLUDED.latency_sum,
+        latency_max = GREATEST(r.latency_max, EXCLUDED.latency_max)
+"""
+
+RollupKey = Tuple[str, str, str, datetime]
+
+# Positions in the per-key counter list
+LOG_COUNT, STATUS_2XX, STATUS_5XX, LATENCY_COUNT, LATENCY_SUM, LATENCY_MAX = 0, 1, 4, 5, 6, 7
+
+
+def _minute(ts: datetime) -> datetime:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.replace(second=0, microsecond=0)
+
+
+def _new_counters() -> list:
+    return [0, 0, 0, 0, 0, 0, 0.0, None]
+
+
+class RollupAggregator:
+    """Per-minute counts of stored logs, flushed to ``logs_rollup_1m`` every few seconds.
+
+    Counts are kept per (tenant, source, log_level, minute) in memory and
+    written with one ``INSERT ... ON CONFLICT DO UPDATE`` per flush, so the
+    flush cost depends on the number of distinct keys, not on log volume.
+    Several processors can share the table since conflicts add up. Counts not
+    yet flushed are lost if the process is killed.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.pending: Dict[RollupKey, list] = {}
+
+        metrics.describe("log_processor_rollup_keys_flushed_total", "Rollup rows upserted into logs_rollup_1m")
+        metrics.describe("log_processor_rollup_flush_ms", "Duration of the last rollup flush")
+
+    async def init_schema(self):
+        async with self.pool.acquire() as conn:
+            await conn.execute(ROLLUP_SCHEMA)
+
+    def add(self, logs: List[LogModel]):
+        pending = self.pending
+        for log in logs:
+            key = (log.tenant or "default", log.source or "unknown", log.log_level or "INFO", _minute(log.timestamp))
+            counters = pending.get(key)
+            if counters is None:
+                counters = pending[key] = _new_counters()
+            counters[LOG_COUNT] += 1
+
+            status = log.http_status
+            if status is not None and 200 <= status < 600:
+                counters[STATUS_2XX + status // 100 - 2] += 1
+
+            # Same field the fact generator reads the latency from
+            latency = log.extra.get("latency") if isinstance(log.extra, dict) else None
+            if isinstance(latency, (int, float)) and not isinstance(latency, bool):
+                counters[LATENCY_COUNT] += 1
+                counters[LATENCY_SUM] += latency
+                if counters[LATENCY_MAX] is None or latency > counters[LATENCY_MAX]:
+                    counters[LATENCY_MAX] = latency
+
+    async def flush(self):
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, {}
+        started = time.monotonic()
+        try:
+            columns = [[] for _ in range(12)]
+            for key, counters in batch.items():
+                for column, value in zip(columns, (*key, *counters)):
+                    column.append(value)
+            async with self.pool.acquire() as conn:
+                await conn.execute(UPSERT_QUERY, *columns)
+        except Exception:
+            self._merge_back(batch)
+            raise
+        metrics.inc("log_processor_rollup_keys_flushed_total", len(batch))
+        metrics.set_gauge("log_processor_rollup_flush_ms", round((time.monotonic() - started) * 1000, 2))
+        logger.debug("Flushed %d rollup rows", len(batch))
+
+    def _merge_back(self, batch: Dict[RollupKey, list]):
+        """Keep the counts of a failed flush for the next attempt"""
+        for key, counters in batch.items():
+            current = self.pending.get(key)
+            if current is None:
+                self.pending[key] = counters
+                continue
+            for i in range(LATENCY_MAX):
+                current[i] += counters[i]
+            if counters[LATENCY_MAX] is not None and (current[LATENCY_MAX] is None or counters[LATENCY_MAX] > current[LATENCY_MAX]):
+                current[LATENCY_MAX] = counters[LATENCY_MAX]
+
+    async def run(self):
+        """Background task flushing the rollups every rollup_flush_sec"""
+        while True:
+            await asyncio.sleep(settings.rollup_flush_sec)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Rollup flush failed, keeping the counts for the next attempt: %s", e)
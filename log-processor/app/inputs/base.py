@@ -0,0 +1,30 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class LogInput(ABC):
+    """Source of raw logs feeding the processor's batch path.
+
+    ``consume_batches`` calls ``handle_batch_fn(values, origins)`` where
+    ``values`` are raw log dicts and ``origins`` holds one
+    (topic, partition, offset) tuple per value, used for replay deduplication.
+    The size of each batch and how long to wait for it to fill up are read
+    from ``controller.batch_size`` and ``controller.linger_ms`` before every
+    batch, so they can change while consuming.
+    """
+
+    @abstractmethod
+    async def start(self):
+        ...
+
+    @abstractmethod
+    async def stop(self):
+        ...
+
+    @abstractmethod
+    async def consume_batches(self, handle_batch_fn, controller):
+        ...
+
+    async def lag(self) -> Optional[int]:
+        """Number of messages waiting to be consumed, None if unknown"""
+        return None
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+import mmap
+import os
+from typing import List, Optional, Tuple
+
+from app.inputs.base import LogInput
+
+logger = logging.getLogger(__name__)
+
+
+class FileTailInput(LogInput):
+    """Tails a newline-delimited JSON file, such as the output of a Vector file sink.
+
+    The file is read through mmap windows of ``chunk_bytes``, and the byte
+    offset of the last handled batch is checkpointed to disk together with
+    the file's inode. If the file is rotated (new inode at the same path),
+    the old file is read to the end before switching. If it is truncated
+    (e.g. by logrotate's copytruncate), reading restarts from the beginning
+    under a new truncation generation. In replay mode consumption stops at
+    the end of the file instead of waiting for new lines.
+    """
+
+    def __init__(self, path: str, checkpoint_path: str, chunk_bytes: int, replay: bool = False):
+        self.path = path
+        self.checkpoint_path = checkpoint_path
+        self.chunk_bytes = chunk_bytes
+        self.replay = replay
+        self.file = None
+        self.inode = None
+        # Times the file was truncated in place, the inode does not change then
+        self.generation = 0
+        self.offset = 0
+
+    @property
+    def topic(self) -> str:
+        # The inode keeps offsets of a rotated file distinct from the new one, the
+        # generation those written after a truncation distinct from the ones before
+        if self.generation:
+            return f"file:{self.path}:{self.inode}:{self.generation}"
+        return f"file:{self.path}:{self.inode}"
+
+    async def start(self):
+        self._open()
+        checkpoint = self._load_checkpoint()
+        if checkpoint and checkpoint.get("inode") == self.inode:
+            self.offset = checkpoint.get("offset", 0)
+            self.generation = checkpoint.get("generation", 0)
+        logger.info("Tailing %s from offset %d%s", self.path, self.offset, " (replay)" if self.replay else "")
+
+    async def stop(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+            logger.info("File input stopped.")
+
+    async def consume_batches(self, handle_batch_fn, controller):
+        try:
+            while self.file:
+                values, origins, offset, caught_up = await asyncio.to_thread(self._read_batch, controller.batch_size)
+                if values:
+                    logger.debug("Read batch of %d lines from %s", len(values), self.path)
+                    await handle_batch_fn(values, origins)
+                if offset != self.offset:
+                    self.offset = offset
+                    self._save_checkpoint()
+                if not caught_up:
+                    continue
+
+                if self._rotated():
+                    logger.info("%s was rotated, switching to the new file", self.path)
+                    self.file.close()
+                    self._open()
+                    continue
+                if self.replay:
+                    logger.info("Replay of %s finished at offset %d", self.path, self.offset)
+                    return
+                await asyncio.sleep(controller.linger_ms / 1000)
+        except Exception as e:
+            logger.error("Error during file consumption: %s", e)
+        finally:
+            await self.stop()
+
+    def _open(self):
+        self.file = open(self.path, "rb")
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        self.generation = 0
+        self.offset = 0
+
+    def _rotated(self) -> bool:
+        try:
+            return os.stat(self.path).st_ino != self.inode
+        except FileNotFoundError:
+            return False
+
+    def _read_batch(self, max_records: int) -> Tuple[List[dict], List[tuple], int, bool]:
+        """Parse up to max_records complete lines after the current offset"""
+        size = os.fstat(self.file.fileno()).st_size
+        offset = self.offset
+        if size < offset:
+            self.generation += 1
+            logger.warning("%s was truncated, reading from the start (generation %d)", self.path, self.generation)
+            offset = 0
+        if size == offset:
+            return [], [], offset, True
+
+        # mmap offsets must be aligned to the allocation granularity
+        map_start = offset - offset % mmap.ALLOCATIONGRANULARITY
+        length = min(size - map_start, offset - map_start + self.chunk_bytes)
+        values, origins = [], []
+        with mmap.mmap(self.file.fileno(), length, access=mmap.ACCESS_READ, offset=map_start) as mm:
+            position = offset - map_start
+            while len(values) < max_records and position < length:
+                newline = mm.find(b"\n", position)
+                if newline == -1:
+                    if position == offset - map_start and length < size - map_start:
+                        # A single line longer than the window, map the rest of the file
+                        return self._read_long_line(offset, size)
+                    if self.replay and map_start + length == size:
+                        # Last line of a finished file without a trailing newline
+                        newline = length
+                    else:
+                        break
+                line = mm[position:newline]
+                value = self._parse_line(line, map_start + position)
+                if value is not None:
+                    values.append(value)
+                    origins.append((self.topic, 0, map_start + position))
+                position = newline + 1
+
+        new_offset = min(map_start + position, size)
+        # Only a partial last line left counts as caught up too, so the caller waits for the rest
+        return values, origins, new_offset, new_offset >= size or new_offset == offset
+
+    def _read_long_line(self, offset: int, size: int) -> Tuple[List[dict], List[tuple], int, bool]:
+        self.file.seek(offset)
+        line = self.file.readline()
+        if not line.endswith(b"\n") and not self.replay:
+            return [], [], offset, True
+        value = self._parse_line(line, offset)
+        new_offset = offset + len(line)
+        if value is None:
+            return [], [], new_offset, new_offset >= size
+        return [value], [(self.topic, 0, offset)], new_offset, new_offset >= size
+
+    def _parse_line(self, line: bytes, offset: int) -> Optional[dict]:
+        if not line.strip():
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            logger.warning("Skipping malformed JSON line at offset %d of %s", offset, self.path)
+            return None
+
+    def _load_checkpoint(self) -> Optional[dict]:
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _save_checkpoint(self):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"path": self.path, "inode": self.inode, "generation": self.generation, "offset": self.offset}, f)
+        os.replace(tmp_path, self.checkpoint_path)
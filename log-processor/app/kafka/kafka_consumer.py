@@ -1,12 +1,16 @@
 import logging
 import json
+import time
+from typing import Optional
+
 from aiokafka import AIOKafkaConsumer
 from app.config import settings
+from app.inputs.base import LogInput
 
 logger = logging.getLogger(__name__)
 
 
-class KafkaLogConsumer:
+class KafkaLogConsumer(LogInput):
     def __init__(self, topic: str):
         self.topic = topic
         self.bootstrap_servers = settings.kafka_bootstrap_servers
@@ -24,19 +28,59 @@ class KafkaLogConsumer:
             value_deserializer=lambda m: json.loads(m.decode("utf-8")),
         )
         await self.consumer.start()
-        logger.info(f"Started Kafka consumer for topic: {self.topic}")
+        logger.info("Started Kafka consumer for topic: %s", self.topic)
 
     async def stop(self):
         if self.consumer:
             await self.consumer.stop()
             logger.info("Kafka consumer stopped.")
 
+    async def consume_batches(self, handle_batch_fn, controller):
+        try:
+            while True:
+                messages = await self._fetch_batch(controller.batch_size, controller.linger_ms)
+                if messages:
+                    logger.debug("Received batch of %d messages", len(messages))
+                    await handle_batch_fn(
+                        [msg.value for msg in messages],
+                        [(msg.topic, msg.partition, msg.offset) for msg in messages],
+                    )
+        except Exception as e:
+            logger.error("Error during log consumption: %s", e)
+        finally:
+            await self.stop()
+
+    async def _fetch_batch(self, max_records: int, linger_ms: float) -> list:
+        """Collect up to max_records messages, waiting at most linger_ms for the batch to fill"""
+        deadline = time.monotonic() + linger_ms / 1000
+        messages = []
+        while len(messages) < max_records:
+            remaining_ms = max(int((deadline - time.monotonic()) * 1000), 0)
+            batches = await self.consumer.getmany(timeout_ms=remaining_ms, max_records=max_records - len(messages))
+            for partition_messages in batches.values():
+                messages.extend(partition_messages)
+            if remaining_ms == 0:
+                break
+        return messages
+
+    async def lag(self) -> Optional[int]:
+        """Sum of highwater minus position over the assigned partitions"""
+        if not self.consumer:
+            return None
+        total = 0
+        for tp in self.consumer.assignment():
+            highwater = self.consumer.highwater(tp)
+            if highwater is None:
+                continue
+            total += max(highwater - await self.consumer.position(tp), 0)
+        return total
+
     async def consume(self, handle_log_fn):
         try:
             async for msg in self.consumer:
-                logger.debug(f"Received message: {msg.value}")
+                logger.debug("Received message: %s", msg.value)
                 await handle_log_fn(msg.value)
         except Exception as e:
-            logger.error(f"Error during log consumption: {e}")
+            logger.error("Error during log consumption: %s", e)
         finally:
             await self.stop()
@@ -24,10 +24,12 @@ class KafkaProducer:
             await self.producer.stop()
             logger.info("Kafka producer stopped.")
 
-    async def send_fact(self, fact: dict, key: str = None):
+    async def send_fact(self, fact: dict, key: str = None) -> bool:
         try:
             partition_key = key.encode("utf-8") if key else None
             await self.producer.send_and_wait(self.topic, value=fact, key=partition_key)
-            logger.debug(f"Sent fact to topic {self.topic}: {fact}")
+            logger.debug("Sent fact to topic %s: %s", self.topic, fact)
+            return True
         except Exception as e:
-            logger.error(f"Failed to send fact: {e}")
\ No newline at end of file
+            logger.error("Failed to send fact: %s", e)
+            return False
\ No newline at end of file
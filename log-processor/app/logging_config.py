@@ -1,9 +1,123 @@
+import json
 import logging
+import logging.handlers
+import queue
+import random
 import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from app.config import settings
+
+_listener = None
+
+# Keys are message templates; f-string messages would make every key unique
+MAX_RATE_LIMIT_KEYS = 10000
+
+
+class RateLimitFilter(logging.Filter):
+    """Per-message rate limiting and sampling, applied before records are queued.
+
+    Records are keyed by logger name and unformatted message template, so one
+    noisy call site cannot drown out the others. Each key gets a token bucket;
+    records beyond it are dropped and the number dropped is attached to the
+    next record that gets through. INFO and DEBUG records are additionally
+    sampled with ``log_sample_rate``.
+    """
+
+    def __init__(self, rate_per_sec: float, burst: int, sample_rate: float):
+        super().__init__()
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self.sample_rate = sample_rate
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if self.rate_per_sec <= 0:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self.lock:
+            if key not in self.buckets and len(self.buckets) >= MAX_RATE_LIMIT_KEYS:
+                self.buckets.clear()
+            tokens, last, suppressed = self.buckets.get(key, (self.burst, now, 0))
+            tokens = min(self.burst, tokens + (now - last) * self.rate_per_sec)
+            if tokens < 1:
+                self.buckets[key] = (tokens, now, suppressed + 1)
+                return False
+            self.buckets[key] = (tokens - 1, now, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """Queues records without formatting them; the listener thread does the formatting"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        suppressed = getattr(record, "suppressed", None)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        suppressed = getattr(record, "suppressed", None)
+        if suppressed:
+            line += f" (suppressed {suppressed} similar messages)"
+        return line
+
 
 def setup_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-        handlers=[logging.StreamHandler(sys.stdout)]
-    )
+    """Route all logging through a queue to a background writer thread"""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if settings.log_format == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(TextFormatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
+
+    queue_handler = LazyQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(RateLimitFilter(
+        settings.log_rate_limit_per_sec,
+        settings.log_rate_limit_burst,
+        settings.log_sample_rate,
+    ))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(settings.log_level.upper())
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
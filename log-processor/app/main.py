@@ -1,145 +1,545 @@
 import asyncio
-import json
 import logging
+import os
 import signal
 import sys
-from typing import Dict, Any
+import time
+from typing import Dict, Any, List, Optional, Tuple
 
+from app.inputs.base import LogInput
+from app.inputs.file_tail import FileTailInput
 from app.kafka.kafka_consumer import KafkaLogConsumer
 from app.kafka.kafka_producer import KafkaProducer
-from app.processors.facts_generator import FactGenerator
+from app.processors.facts_generator import FactGenerator, generators_for
+from app.processors.fact_coalescer import FactCoalescer
+from app.processors.cache import warm_up_redis
+from app.processors.batch_controller import BatchController
+from app.processors.latency_sketch import latency_tracker
+from app.processors.fact_policy import fact_policy
+from app.processors.load_shedder import LoadShedder
+from app.processors.log_parsers import LogParsers
+from app.processors.tenant_scheduler import TenantScheduler, parse_tenant_map
+from app.processors.window_state import WindowState
+from app.monitoring.http_server import HttpServer, json_response, text_response
+from app.monitoring.metrics import metrics
+from app.monitoring.diagnostics import Diagnostics
+from app.storage.spool import DiskSpool, SpoolDrainer, log_to_spool
 from app.config import settings
 from app.db.postgres import Database
 from app.models.log_model import LogModel
-from app.logging_config import setup_logging
+from app.logging_config import setup_logging, shutdown_logging
 
 # Setup logging
 setup_logging()
 logger = logging.getLogger(__name__)
 
+def create_log_input() -> LogInput:
+    """Build the configured log input"""
+    if settings.input_mode == "kafka":
+        return KafkaLogConsumer(settings.kafka_topic_input)
+    if settings.input_mode == "file":
+        return FileTailInput(
+            settings.file_input_path,
+            settings.file_input_checkpoint,
+            chunk_bytes=settings.file_input_chunk_bytes,
+            replay=settings.file_input_replay,
+        )
+    raise ValueError(f"Unsupported input mode: {settings.input_mode}")
+
+
 class LogProcessor:
     def __init__(self):
         self.repo = None
         self.consumer = None
         self.producer = None
+        self.coalescer = None
+        self.coalescer_task = None
+        self.partition_task = None
+        self.rollup_task = None
+        self.latency_task = None
+        self.spool = None
+        self.spool_task = None
+        # Until then batches go straight to the spool, the database failed the last insert
+        self.db_retry_at = 0.0
+        self.batch_controller = None
+        self.tenant_scheduler = None
+        self.tenant_task = None
+        self.load_shedder = None
+        self.log_parsers = None
+        self.window_state = None
+        self.window_state_task = None
+        self.policy_task = None
+        self.http_server = None
+        self.diagnostics = None
+        self.watchdog_task = None
         self.running = False
+        self.stopped = False
+        self.ready = asyncio.Event()
+        self.started_at = time.monotonic()
+        self.time_to_first_fact = None
+        self._log_samples_shown = 0
+        self._ack_ms = []
 
     async def start(self):
         """Initialize and start all services"""
         try:
             logger.info("Starting Log Processor...")
-            
-            # Initialize database connection
-            self.repo = Database()
-            await self.repo.connect()
-            logger.info("Database connection established")
 
-            # Initialize Kafka consumer
-            self.consumer = KafkaLogConsumer(settings.kafka_topic_input)
-            await self.consumer.start()
-            logger.info(f"Kafka consumer started for topic: {settings.kafka_topic_input}")
+            if settings.diagnostics_enabled:
+                self._start_diagnostics()
+
+            # Keep the live window state of every source for /state/sources
+            if settings.window_state_enabled:
+                self.window_state = WindowState(
+                    top_n=settings.window_state_top_n,
+                    max_sources=settings.window_state_max_sources,
+                    publish_ms=settings.window_state_publish_ms,
+                )
+                self.window_state_task = asyncio.create_task(self.window_state.run())
 
-            # Initialize Kafka producer
+            # Serve health and metrics while the clients connect
+            if settings.http_port:
+                self.http_server = self._create_http_server()
+                await self.http_server.start()
+
+            # Connect Postgres, the log input, the Kafka producer and Redis concurrently
+            self.repo = Database()
+            self.consumer = create_log_input()
             self.producer = KafkaProducer(settings.kafka_bootstrap_servers, settings.kafka_topic_output)
-            await self.producer.start()
-            logger.info(f"Kafka producer started for topic: {settings.kafka_topic_output}")
+            await asyncio.gather(
+                self._timed("Database connection", self.repo.connect()),
+                self._timed(f"Log input ({settings.input_mode})", self.consumer.start()),
+                self._timed(f"Kafka producer ({settings.kafka_topic_output})", self.producer.start()),
+                self._timed("Redis pool", asyncio.to_thread(warm_up_redis, settings.redis_pool_prewarm)),
+            )
+
+            # Keep log partitions ahead of time and apply retention
+            if self.repo.partitions:
+                self.partition_task = asyncio.create_task(self.repo.partitions.run())
+
+            # Flush per-minute rollups of the stored logs
+            if self.repo.rollups:
+                self.rollup_task = asyncio.create_task(self.repo.rollups.run())
+
+            # Share latency sketches with the other workers in the background
+            self.latency_task = asyncio.create_task(latency_tracker.run())
+
+            # Spool writes that fail while a sink is down and replay them later
+            if settings.spool_enabled:
+                self.spool = DiskSpool(
+                    settings.spool_dir,
+                    segment_bytes=settings.spool_segment_bytes,
+                    max_bytes=settings.spool_max_bytes,
+                    fsync=settings.spool_fsync,
+                    fsync_interval_sec=settings.spool_fsync_interval_sec,
+                )
+                drainer = SpoolDrainer(
+                    self.spool, self.repo.insert_logs, self.producer.send_fact, paused_fn=self._overloaded,
+                )
+                self.spool_task = asyncio.create_task(drainer.run())
+                logger.info("Disk spool enabled in %s", settings.spool_dir)
+
+            # Start fact coalescing if enabled
+            if settings.fact_coalescing_enabled:
+                self.coalescer = FactCoalescer(settings.fact_coalescing_rules_dir)
+                self.coalescer_task = asyncio.create_task(self._flush_coalesced_facts())
+                logger.info("Fact coalescing enabled (tick: %ss)", settings.fact_coalescing_tick_sec)
+
+            # Fill structured fields from raw nginx, journald and docker lines
+            if settings.log_parsers_enabled:
+                self.log_parsers = LogParsers(settings.log_parser_cache_size)
+
+            # Load the fact policy and reload it when the file changes
+            fact_policy.load_now(settings.fact_policy_file)
+            if settings.fact_policy_check_sec > 0:
+                self.policy_task = asyncio.create_task(fact_policy.watch(settings.fact_policy_check_sec))
+
+            # Generate facts through per-tenant fair queues if enabled
+            if settings.tenant_scheduling_enabled:
+                self.tenant_scheduler = TenantScheduler(
+                    quantum=settings.tenant_quantum,
+                    weights=parse_tenant_map(settings.tenant_weights),
+                    rate_limits=parse_tenant_map(settings.tenant_rate_limits),
+                    default_rate_limit=settings.tenant_default_rate_limit,
+                    max_pending=settings.tenant_max_pending,
+                    max_per_tenant=settings.tenant_queue_max_logs,
+                )
+                self.tenant_task = asyncio.create_task(self._process_tenant_queues())
+                logger.info("Per-tenant fair scheduling enabled (quantum: %s)", settings.tenant_quantum)
+
+            # Shed low-priority log rows under overload
+            if settings.load_shedding_enabled:
+                mode = settings.load_shedding_mode
+                if mode == "defer" and not self.spool:
+                    logger.warning("Load shedding cannot defer without the spool, sampling instead")
+                    mode = "sample"
+                self.load_shedder = LoadShedder(
+                    lag_threshold=settings.load_shedding_lag_threshold,
+                    queue_threshold=settings.load_shedding_queue_threshold,
+                    mode=mode,
+                    sample_rate=settings.load_shedding_sample_rate,
+                )
+                logger.info("Load shedding enabled (%s)", mode)
+
+            self.batch_controller = BatchController()
 
             self.running = True
-            logger.info("🚀 Log Processor is running successfully!")
+            self._mark_ready()
+            logger.info("🚀 Log Processor is running successfully! (ready in %.2fs)", time.monotonic() - self.started_at)
 
         except Exception as e:
-            logger.error(f"Failed to start Log Processor: {e}")
+            logger.error("Failed to start Log Processor: %s", e)
             await self.stop()
             raise
 
+    def _create_http_server(self) -> HttpServer:
+        server = HttpServer(settings.http_host, settings.http_port)
+
+        async def health(query, body):
+            return json_response({"status": "ok"})
+
+        async def ready(query, body):
+            if self.ready.is_set():
+                return json_response({"status": "ready"})
+            return json_response({"status": "starting"}, 503)
+
+        async def prometheus(query, body):
+            return text_response(metrics.render())
+
+        server.route("GET", "/health", health)
+        server.route("GET", "/ready", ready)
+        server.route("GET", "/metrics", prometheus)
+        if self.diagnostics:
+            self.diagnostics.register_routes(server)
+        if self.window_state:
+            self.window_state.register_routes(server)
+        return server
+
+    def _start_diagnostics(self):
+        """Start the loop stall watchdog and hook profile/allocation dumps to SIGUSR1/SIGUSR2"""
+        self.diagnostics = Diagnostics(
+            settings.diagnostics_dir,
+            stall_threshold_ms=settings.loop_stall_threshold_ms,
+            stall_check_ms=settings.loop_stall_check_ms,
+            profile_sec=settings.profile_duration_sec,
+            sample_hz=settings.profile_sample_hz,
+            tracemalloc_frames=settings.tracemalloc_frames,
+        )
+        self.watchdog_task = asyncio.create_task(self.diagnostics.watchdog.run())
+        if hasattr(signal, "SIGUSR1"):
+            loop = asyncio.get_running_loop()
+            loop.add_signal_handler(signal.SIGUSR1, self.diagnostics.dump_profile)
+            loop.add_signal_handler(signal.SIGUSR2, self.diagnostics.dump_allocations)
+        logger.info("Diagnostics enabled (stall threshold: %sms)", settings.loop_stall_threshold_ms)
+
+    async def _timed(self, name: str, startup):
+        """Await one startup step and report how long it took"""
+        step_started = time.monotonic()
+        await startup
+        logger.info("%s ready in %.2fs", name, time.monotonic() - step_started)
+
+    def _mark_ready(self):
+        """Flip the readiness signal once every client is connected and warm"""
+        self.ready.set()
+        if settings.readiness_file:
+            try:
+                with open(settings.readiness_file, "w") as f:
+                    f.write(str(os.getpid()))
+            except OSError as e:
+                logger.error("Failed to write readiness file %s: %s", settings.readiness_file, e)
+
     async def stop(self):
-        """Gracefully stop all services"""
-        if not self.running:
+        """Gracefully stop all services (also cleans up after a failed start)"""
+        if self.stopped:
             return
-            
+        self.stopped = True
+
         logger.info("Stopping Log Processor...")
         self.running = False
+        self.ready.clear()
+        if settings.readiness_file and os.path.exists(settings.readiness_file):
+            try:
+                os.remove(settings.readiness_file)
+            except OSError as e:
+                logger.warning("Failed to remove readiness file %s: %s", settings.readiness_file, e)
+
+        if self.partition_task:
+            self.partition_task.cancel()
+        if self.rollup_task:
+            self.rollup_task.cancel()
+        if self.latency_task:
+            self.latency_task.cancel()
+        if self.spool_task:
+            self.spool_task.cancel()
+        if self.policy_task:
+            self.policy_task.cancel()
+        if self.watchdog_task:
+            self.watchdog_task.cancel()
+        if self.window_state_task:
+            self.window_state_task.cancel()
+
+        # Let the tenant scheduler finish the round in progress and the facts still queued
+        if self.tenant_task:
+            self.tenant_scheduler.close()
+            try:
+                await self.tenant_task
+            except Exception as e:
+                logger.error("Error generating queued tenant facts: %s", e)
 
-        # Stop Kafka consumer
+        # Stop fact coalescing and send what is still pending
+        if self.coalescer_task:
+            self.coalescer_task.cancel()
+            try:
+                await self.coalescer_task
+            except asyncio.CancelledError:
+                pass
+        if self.coalescer and self.producer:
+            await self._send_coalesced_facts()
+
+        # Stop log input
         if self.consumer:
             await self.consumer.stop()
-            logger.info("Kafka consumer stopped")
+            logger.info("Log input stopped")
 
         # Stop Kafka producer
         if self.producer:
             await self.producer.stop()
             logger.info("Kafka producer stopped")
 
+        if self.spool:
+            await self.spool.close()
+
         # Close database connection
         if self.repo:
             await self.repo.close()
             logger.info("Database connection closed")
 
+        if self.http_server:
+            await self.http_server.stop()
+
         logger.info("Log Processor stopped gracefully")
+        shutdown_logging()
 
     async def handle_log(self, log_data: Dict[Any, Any]):
         """Process a single log message"""
+        await self.handle_batch([log_data])
+
+    async def handle_batch(self, batch: List[Dict[Any, Any]], origins: Optional[List[Tuple[str, int, int]]] = None):
+        """Process a batch of log messages: bulk insert, then one fact per log.
+
+        origins holds the (topic, partition, offset) of each message, if known.
+        """
+        batch_started = time.monotonic()
+        # A reloaded fact policy takes effect between batches
+        fact_policy.activate_pending()
+        logs = []
+        for i, log_data in enumerate(batch):
+            log = self._parse_log(log_data)
+            if log is not None:
+                if origins:
+                    log.kafka_topic, log.kafka_partition, log.kafka_offset = origins[i]
+                logs.append(log)
+        if self.log_parsers:
+            self.log_parsers.publish_metrics()
+        if not logs:
+            return
+
+        # Under overload only high-priority rows are stored right away
+        shed = []
+        if self.load_shedder:
+            arrival = {id(log): i for i, log in enumerate(logs)}
+            logs, shed = self.load_shedder.split(logs)
+            if shed:
+                await self._shed_rows(shed)
+
+        # Save logs to PostgreSQL in one round trip, replayed logs are skipped
+        insert_started = time.monotonic()
+        if self.spool and insert_started < self.db_retry_at:
+            # Do not wait for the database to time out again on every batch
+            if await self._spool("log", [log_to_spool(log) for log in logs]):
+                logger.warning("Database unavailable, spooled %d logs to disk for later replay", len(logs))
+        else:
+            try:
+                logs = await self.repo.insert_logs(logs)
+                logger.debug("Saved %d logs to database", len(logs))
+            except Exception as e:
+                logger.error("Error saving %d logs to database: %s", len(logs), e)
+                if not self.spool:
+                    return
+                self.db_retry_at = time.monotonic() + settings.spool_breaker_sec
+                if await self._spool("log", [log_to_spool(log) for log in logs]):
+                    logger.warning("Spooled %d logs to disk for later replay", len(logs))
+        insert_ms = (time.monotonic() - insert_started) * 1000
+
+        # Facts and window counters cover shed logs too
+        if shed:
+            logs = sorted(logs + shed, key=lambda log: arrival[id(log)])
+
+        self._ack_ms = []
+        if self.tenant_scheduler:
+            await self.tenant_scheduler.put_many(logs)
+        else:
+            await self._process_facts(logs)
+
+        if self.batch_controller:
+            await self._observe_batch(len(batch), batch_started, insert_ms)
+
+    async def _shed_rows(self, shed: List[LogModel]):
+        """Defer shed rows to the spool, or count sampled-out rows in the rollups so they stay exact"""
+        if self.load_shedder.mode == "defer":
+            await self._spool("log", [log_to_spool(log) for log in shed])
+        elif self.repo.rollups:
+            self.repo.rollups.add(shed)
+
+    async def _spool(self, kind: str, payloads: List[dict]) -> bool:
+        """Append records to the spool; if the spool fails too (e.g. disk full) they are lost, consuming goes on"""
+        try:
+            await self.spool.append_many(kind, payloads)
+            return True
+        except Exception as e:
+            metrics.inc("log_processor_spool_write_failures_total", len(payloads), {"kind": kind})
+            logger.error("Could not spool %d %s records, dropping them: %s", len(payloads), kind, e)
+            return False
+
+    def _overloaded(self) -> bool:
+        return bool(self.load_shedder and self.load_shedder.overloaded)
+
+    async def _observe_batch(self, records: int, batch_started: float, insert_ms: float):
+        """Feed the latencies of the finished batch and the input lag to the batch controller"""
+        try:
+            lag = await self.consumer.lag()
+        except Exception as e:
+            logger.warning("Could not read consumer lag: %s", e)
+            lag = None
+        if self.load_shedder:
+            self.load_shedder.update(lag, self.tenant_scheduler.pending if self.tenant_scheduler else None)
+        ack_ms = sum(self._ack_ms) / len(self._ack_ms) if self._ack_ms else None
+        self.batch_controller.observe(
+            records,
+            batch_ms=(time.monotonic() - batch_started) * 1000,
+            insert_ms=insert_ms,
+            ack_ms=ack_ms,
+            lag=lag,
+        )
+
+    def _parse_log(self, log_data: Dict[Any, Any]) -> Optional[LogModel]:
+        """Parse raw log data into a LogModel, returns None if it is unusable"""
         try:
             # Log the raw data for debugging (only first few times)
-            if not hasattr(self, '_log_samples_shown'):
-                self._log_samples_shown = 0
-            
-            if self._log_samples_shown < 3:
-                logger.info(f"Sample raw log data: {json.dumps(log_data, indent=2, default=str)}")
+            show_sample = self._log_samples_shown < 3
+            if show_sample:
+                logger.info("Sample raw log data: %s", log_data)
                 self._log_samples_shown += 1
 
-            # Parse log data into LogModel
+            # Parse log data into LogModel, with the fields its log_type parser finds in the raw line
+            if self.log_parsers:
+                log_data = self.log_parsers.enrich(log_data)
             log = LogModel(**log_data)
-            logger.debug(f"Processing log from {log.source}: {log.message[:100] if log.message else 'No message'}...")
-            
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Processing log from %s: %.100s", log.source, log.message or "No message")
+
             # Debug log parsing (only for first few logs)
-            if self._log_samples_shown <= 3:
-                logger.info(f"Parsed log - Source: '{log.source}', Level: '{log.log_level}', Message: '{log.message}'")
+            if show_sample:
+                logger.info("Parsed log - Source: '%s', Level: '%s', Message: '%s'", log.source, log.log_level, log.message)
+            return log
 
-            # Save log to PostgreSQL
-            await self.repo.insert_log(log)
-            logger.debug(f"Log saved to database: {log.source}")
+        except Exception as e:
+            # Only the keys and a bounded prefix of the payload, formatted by the logging thread
+            logger.error(
+                "Error processing log: %s (keys: %s, data: %.500s)",
+                e,
+                list(log_data.keys()) if isinstance(log_data, dict) else "Not a dict",
+                log_data,
+            )
+            return None
 
-            # Generate facts from the log
-            try:
-                fact_generator = FactGenerator(log)
-                fact = fact_generator.generate_facts_from_log()
-                
+    async def _process_facts(self, logs: List[LogModel]):
+        """Generate and send the facts of stored logs, with one Redis round trip per node"""
+        if not logs:
+            return
+        try:
+            generators = generators_for(logs)
+        except Exception as e:
+            logger.error("Error preparing facts for %d logs: %s", len(logs), e)
+            return
+        for fact_generator in generators:
+            await self._process_fact(fact_generator)
+
+    async def _process_fact(self, fact_generator: FactGenerator):
+        """Generate the fact for a stored log and send it to Kafka"""
+        log = fact_generator.log
+        try:
+            fact = fact_generator.generate_facts_from_log()
+            if self.window_state:
+                self.window_state.record(log, fact)
+
+            # Hold back uneventful facts when coalescing is enabled
+            if self.coalescer:
+                fact = self.coalescer.offer(fact)
+
+            if fact is not None:
                 # Send fact to Kafka (use model_dump with mode='json' for proper serialization)
-                await self.producer.send_fact(fact.model_dump(mode='json'))
-                logger.debug(f"Fact sent to Kafka: {fact.source}")
-                logger.info(f"Successfully processed log from {log.source}")
-            except Exception as fact_error:
-                logger.error(f"Error generating facts: {fact_error}")
-                logger.error(f"Log source: '{log.source}', message: '{log.message}'")
-                raise
+                await self._send_fact(fact.model_dump(mode='json'))
+                logger.debug("Fact sent to Kafka: %s", fact.source)
+            logger.debug("Successfully processed log from %s", log.source)
+        except Exception as fact_error:
+            logger.error("Error generating facts: %s (source: '%s', message: '%.200s')", fact_error, log.source, log.message)
 
-        except Exception as e:
-            logger.error(f"Error processing log: {e}")
-            logger.error(f"Raw log data keys: {list(log_data.keys()) if isinstance(log_data, dict) else 'Not a dict'}")
-            if isinstance(log_data, dict) and len(str(log_data)) < 1000:
-                logger.error(f"Full log data: {log_data}")
-            else:
-                logger.error(f"Log data (truncated): {str(log_data)[:500]}...")
+    async def _send_fact(self, fact: dict):
+        """Send a fact to Kafka, spooling it to disk if the producer fails"""
+        send_started = time.monotonic()
+        sent = await self.producer.send_fact(fact)
+        self._ack_ms.append((time.monotonic() - send_started) * 1000)
+        if sent:
+            if self.time_to_first_fact is None:
+                self.time_to_first_fact = time.monotonic() - self.started_at
+                logger.info("Time to first fact: %.2fs", self.time_to_first_fact)
+        elif self.spool:
+            await self._spool("fact", [fact])
+
+    async def _send_coalesced_facts(self):
+        """Send one summary fact per source for the logs held back since the last tick"""
+        for fact in self.coalescer.drain():
+            await self._send_fact(fact.model_dump(mode='json'))
+            logger.debug("Coalesced fact sent to Kafka: %s (%d logs)", fact.source, fact.coalesced_count)
+
+    async def _process_tenant_queues(self):
+        """Background task generating facts in the order chosen by the tenant scheduler"""
+        while True:
+            logs = await self.tenant_scheduler.get_batch()
+            if not logs:
+                # Only once the scheduler is closed and empty
+                return
+            fact_policy.activate_pending()
+            await self._process_facts(logs)
+
+    async def _flush_coalesced_facts(self):
+        """Background task draining the coalescer once per tick"""
+        while True:
+            await asyncio.sleep(settings.fact_coalescing_tick_sec)
+            try:
+                await self._send_coalesced_facts()
+            except Exception as e:
+                logger.error("Error sending coalesced facts: %s", e)
 
     async def run(self):
         """Main processing loop"""
         try:
             await self.start()
             
-            # Start consuming logs
-            await self.consumer.consume(self.handle_log)
+            # Start consuming logs, batch size and linger time follow the controller
+            await self.consumer.consume_batches(self.handle_batch, self.batch_controller)
             
         except KeyboardInterrupt:
             logger.info("Received interrupt signal")
         except Exception as e:
-            logger.error(f"Unexpected error in main loop: {e}")
+            logger.error("Unexpected error in main loop: %s", e)
         finally:
             await self.stop()
 
 def signal_handler(sig, frame):
     """Handle shutdown signals"""
-    logger.info(f"Received signal {sig}, initiating shutdown...")
+    logger.info("Received signal %s, initiating shutdown...", sig)
     sys.exit(0)
 
 async def main():
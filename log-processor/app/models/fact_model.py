@@ -18,6 +18,10 @@ class Fact(BaseModel):
     unauthorized_count: Optional[int] = 0
     potential_scraper: Optional[bool] = False
     performance_latency: Optional[float] = None
+    latency_p50: Optional[float] = None
+    latency_p95: Optional[float] = None
+    latency_p99: Optional[float] = None
+    coalesced_count: Optional[int] = 1
 
     @field_serializer('timestamp')
     def serialize_timestamp(self, timestamp: datetime) -> str:
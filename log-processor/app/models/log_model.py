@@ -22,6 +22,14 @@ class LogModel(BaseModel):
     tags: List[str] = Field(default_factory=list)
     extra: Dict = Field(default_factory=dict)
     tenant: str = "default"
+    # Where the log was read from, used to skip replayed logs
+    kafka_topic: Optional[str] = None
+    kafka_partition: Optional[int] = None
+    kafka_offset: Optional[int] = None
+    # Stored rows stand for this many logs when low-priority logs are sampled under overload
+    sample_weight: float = 1.0
+    # Drain template matched when the log was stored with template compression, not a column
+    _template: Optional[str] = None
 
     @model_validator(mode='before')
     def extract_fields_from_any_structure(cls, values):
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import traceback
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+from app.monitoring.http_server import HttpServer, json_response, text_response
+from app.monitoring.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_PROFILE_SEC = 120
+MAX_RECENT_STALLS = 20
+# Tracing machinery allocations are not interesting in a snapshot
+TRACEMALLOC_IGNORED = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"))
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class LoopStallWatchdog:
+    """Reports callbacks that block the event loop for longer than ``threshold_ms``.
+
+    A heartbeat task measures how late each of its wake-ups is (the loop lag).
+    A watchdog thread notices when the heartbeat is overdue and captures the
+    stack of the loop thread while the blocking callback is still running, so
+    the report names the code responsible rather than the code that ran after.
+    """
+
+    def __init__(self, threshold_ms: float, interval_ms: float):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.loop_thread_id = None
+        self.last_beat = time.monotonic()
+        self.captured_stack: Optional[List[str]] = None
+        self.recent = deque(maxlen=MAX_RECENT_STALLS)
+        self.stopping = threading.Event()
+        self.thread = None
+
+        metrics.describe("log_processor_loop_lag_ms", "Delay of the event loop heartbeat")
+        metrics.describe("log_processor_loop_stalls_total", "Callbacks that blocked the event loop longer than the threshold")
+
+    async def run(self):
+        self.loop_thread_id = threading.get_ident()
+        self.thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self.thread.start()
+        try:
+            while True:
+                self.last_beat = time.monotonic()
+                await asyncio.sleep(self.interval)
+                lag = time.monotonic() - self.last_beat - self.interval
+                metrics.set_gauge("log_processor_loop_lag_ms", round(lag * 1000, 2))
+                if lag > self.threshold:
+                    self._record_stall(lag)
+                self.captured_stack = None
+        finally:
+            self.stopping.set()
+
+    def _watch(self):
+        while not self.stopping.wait(self.interval):
+            overdue = time.monotonic() - self.last_beat - self.interval
+            if overdue > self.threshold and self.captured_stack is None:
+                frame = sys._current_frames().get(self.loop_thread_id)
+                if frame is not None:
+                    self.captured_stack = traceback.format_stack(frame)
+
+    def _record_stall(self, lag: float):
+        stack = self.captured_stack or ["(not captured, the stall ended before the watchdog looked)\n"]
+        self.recent.append({
+            "at": time.time(),
+            "duration_ms": round(lag * 1000, 1),
+            "stack": "".join(stack),
+        })
+        metrics.inc("log_processor_loop_stalls_total")
+        logger.warning("Event loop blocked for %.0f ms in:\n%s", lag * 1000, "".join(stack[-8:]))
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of every thread and aggregates them in collapsed-stack format.
+
+    The output (one ``thread;outer;...;inner count`` line per distinct stack)
+    can be fed straight to flamegraph.pl or speedscope. Nothing runs between
+    profiles.
+    """
+
+    def __init__(self, sample_hz: int):
+        self.interval = 1 / sample_hz
+        self.lock = threading.Lock()
+
+    def profile(self, seconds: float) -> str:
+        """Sample for the given number of seconds, blocking the calling thread"""
+        seconds = min(max(seconds, 0.1), MAX_PROFILE_SEC)
+        if not self.lock.acquire(blocking=False):
+            raise ValueError("a profile is already running")
+        try:
+            stacks = self._sample(seconds)
+        finally:
+            self.lock.release()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def _sample(self, seconds: float) -> Counter:
+        own_id = threading.get_ident()
+        names = {}
+        stacks = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(thread_id, str(thread_id)))
+                stacks[";".join(reversed(labels))] += 1
+            time.sleep(self.interval)
+        return stacks
+
+
+class AllocationTracker:
+    """``tracemalloc`` snapshots, tracing starts on the first request since it slows allocations down"""
+
+    def __init__(self, frames: int):
+        self.frames = frames
+        self.previous = None
+
+    def snapshot(self, limit: int = 20) -> Dict:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            return {"tracing": "started", "hint": "request again for a snapshot"}
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(TRACEMALLOC_IGNORED)
+        current, peak = tracemalloc.get_traced_memory()
+        report = {
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "top": [self._stat(stat) for stat in snapshot.statistics("lineno")[:limit]],
+        }
+        if self.previous is not None:
+            report["growth"] = [
+                self._stat(stat) for stat in snapshot.compare_to(self.previous, "lineno")[:limit] if stat.size_diff > 0
+            ]
+        self.previous = snapshot
+        return report
+
+    def stop(self) -> Dict:
+        tracemalloc.stop()
+        self.previous = None
+        return {"tracing": "stopped"}
+
+    @staticmethod
+    def _stat(stat) -> Dict:
+        entry = {"location": str(stat.traceback), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+        if hasattr(stat, "size_diff"):
+            entry["size_diff_kb"] = round(stat.size_diff / 1024, 1)
+        return entry
+
+
+class Diagnostics:
+    """Stall watchdog, profiler and allocation snapshots behind admin endpoints and signals"""
+
+    def __init__(self, directory: str, stall_threshold_ms: float, stall_check_ms: float,
+                 profile_sec: float, sample_hz: int, tracemalloc_frames: int):
+        self.directory = directory
+        self.profile_sec = profile_sec
+        self.watchdog = LoopStallWatchdog(stall_threshold_ms, stall_check_ms)
+        self.profiler = SamplingProfiler(sample_hz)
+        self.allocations = AllocationTracker(tracemalloc_frames)
+        self.dumps = set()
+
+    def register_routes(self, server: HttpServer):
+        async def stalls(query, body):
+            return json_response(list(self.watchdog.recent))
+
+        async def profile(query, body):
+            seconds = float(query.get("seconds", [self.profile_sec])[0])
+            return text_response(await asyncio.to_thread(self.profiler.profile, seconds))
+
+        async def allocations(query, body):
+            if query.get("stop", ["0"])[0] == "1":
+                return json_response(self.allocations.stop())
+            limit = int(query.get("limit", ["20"])[0])
+            return json_response(await asyncio.to_thread(self.allocations.snapshot, limit))
+
+        server.route("GET", "/debug/stalls", stalls)
+        server.route("GET", "/debug/profile", profile)
+        server.route("GET", "/debug/allocations", allocations)
+
+    def dump_profile(self):
+        """Signal handler: write a profile to the diagnostics directory"""
+        self._start_dump("profile", "folded", lambda: self.profiler.profile(self.profile_sec))
+
+    def dump_allocations(self):
+        """Signal handler: write an allocation snapshot to the diagnostics directory"""
+        self._start_dump("allocations", "json", lambda: json.dumps(self.allocations.snapshot(), indent=2))
+
+    def _start_dump(self, kind: str, extension: str, collect):
+        task = asyncio.get_running_loop().create_task(self._dump(kind, extension, collect))
+        self.dumps.add(task)
+        task.add_done_callback(self.dumps.discard)
+
+    async def _dump(self, kind: str, extension: str, collect):
+        try:
+            content = await asyncio.to_thread(collect)
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}.{extension}")
+            with open(path, "w") as f:
+                f.write(content)
+            logger.info("Wrote %s to %s", kind, path)
+        except Exception as e:
+            logger.error("Could not write %s: %s", kind, e)
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Dict, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# A handler receives the query parameters and request body and returns
+# (status code, content type, body)
+Handler = Callable[[Dict[str, list], bytes], Awaitable[Tuple[int, str, bytes]]]
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def json_response(payload, status: int = 200) -> Tuple[int, str, bytes]:
+    return status, "application/json", json.dumps(payload, default=str).encode("utf-8")
+
+
+def text_response(text: str, status: int = 200) -> Tuple[int, str, bytes]:
+    return status, "text/plain; version=0.0.4", text.encode("utf-8")
+
+
+class HttpServer:
+    """Minimal HTTP/1.1 server on the event loop for metrics and admin endpoints.
+
+    Routes are registered per (method, path); path prefixes ending with ``/``
+    also match longer paths, whose remainder is passed as the ``_path``
+    query parameter.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.routes: Dict[Tuple[str, str], Handler] = {}
+        self.server = None
+
+    def route(self, method: str, path: str, handler: Handler):
+        self.routes[(method.upper(), path)] = handler
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info("HTTP server listening on %s:%s", self.host, self.port)
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    def _resolve(self, method: str, path: str):
+        handler = self.routes.get((method, path))
+        if handler:
+            return handler, None
+        for (route_method, route_path), handler in self.routes.items():
+            if route_method == method and route_path.endswith("/") and path.startswith(route_path):
+                return handler, path[len(route_path):]
+        return None, None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = min(int(headers.get("content-length", 0) or 0), MAX_BODY_BYTES)
+            body = await reader.readexactly(length) if length else b""
+
+            url = urlsplit(target)
+            handler, remainder = self._resolve(method.upper(), url.path)
+            if handler is None:
+                status, content_type, payload = json_response({"error": "not found"}, 404)
+            else:
+                query = parse_qs(url.query)
+                if remainder is not None:
+                    query["_path"] = [remainder]
+                try:
+                    status, content_type, payload = await handler(query, body)
+                except ValueError as e:
+                    status, content_type, payload = json_response({"error": str(e)}, 400)
+                except Exception as e:
+                    logger.error("HTTP handler error on %s: %s", url.path, e)
+                    status, content_type, payload = json_response({"error": "internal error"}, 500)
+
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                "Connection: close\r\n\r\n".encode("latin-1") + payload
+            )
+            await writer.drain()
+        except (ValueError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
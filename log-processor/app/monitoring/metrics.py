@@ -0,0 +1,59 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """In-process gauges and counters rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.help: Dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(labels: Optional[Dict[str, str]]) -> LabelKey:
+        return tuple(sorted(labels.items())) if labels else ()
+
+    def describe(self, name: str, help_text: str):
+        self.help[name] = help_text
+
+    def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        with self.lock:
+            self.gauges.setdefault(name, {})[self._key(labels)] = value
+
+    def inc(self, name: str, amount: float = 1, labels: Optional[Dict[str, str]] = None):
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            key = self._key(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def get(self, name: str, labels: Optional[Dict[str, str]] = None) -> Optional[float]:
+        key = self._key(labels)
+        with self.lock:
+            for metrics in (self.gauges, self.counters):
+                if name in metrics and key in metrics[name]:
+                    return metrics[name][key]
+        return None
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            for kind, metrics in (("gauge", self.gauges), ("counter", self.counters)):
+                for name in sorted(metrics):
+                    if name in self.help:
+                        lines.append(f"# HELP {name} {self.help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in metrics[name].items():
+                        label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in key)
+                        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
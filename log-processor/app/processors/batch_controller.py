@@ -0,0 +1,97 @@
+from typing import Optional
+
+from app.config import settings
+from app.monitoring.metrics import metrics
+
+# Weight of the newest observation in the latency averages
+EWMA_ALPHA = 0.3
+# Multiplicative decrease factor applied when the sinks are too slow
+DECREASE_FACTOR = 0.7
+
+
+class BatchController:
+    """AIMD controller for the batch size and linger time of the input loop.
+
+    After every batch it compares the time the batch spent in the sinks
+    (database insert plus fact generation and acks) against
+    ``batch_target_latency_ms``:
+
+    - above target, the batch size is cut multiplicatively, and holds at
+      ``batch_min_records``;
+    - below target with a backlog (full batches or consumer lag above
+      ``batch_lag_threshold``), the batch size grows additively and the
+      linger time grows so batches can fill up;
+    - below target without a backlog, the linger time shrinks so facts are
+      not held back at low traffic.
+
+    With ``adaptive_batching_enabled`` off it keeps the configured fixed
+    values and only reports metrics.
+    """
+
+    def __init__(self):
+        self.adaptive = settings.adaptive_batching_enabled
+        self.min_records = settings.batch_min_records
+        self.max_records = settings.batch_max_records
+        self.min_linger_ms = settings.batch_min_linger_ms
+        self.max_linger_ms = settings.batch_max_linger_ms
+        self.target_ms = settings.batch_target_latency_ms
+        self.increase_step = max(self.min_records, 1)
+
+        self.batch_size = settings.kafka_batch_max_records
+        self.linger_ms = float(settings.kafka_batch_timeout_ms)
+        if self.adaptive:
+            self.batch_size = min(max(self.batch_size, self.min_records), self.max_records)
+            self.linger_ms = min(max(self.linger_ms, self.min_linger_ms), self.max_linger_ms)
+
+        self.batch_ms: Optional[float] = None
+        self.insert_ms: Optional[float] = None
+        self.ack_ms: Optional[float] = None
+
+        metrics.describe("log_processor_batch_size", "Current maximum number of logs per batch")
+        metrics.describe("log_processor_batch_linger_ms", "Current time waited for a batch to fill up")
+        metrics.describe("log_processor_batch_latency_ms", "Average time spent processing one batch")
+        metrics.describe("log_processor_insert_latency_ms", "Average database insert latency per batch")
+        metrics.describe("log_processor_fact_ack_latency_ms", "Average producer ack latency per fact")
+        metrics.describe("log_processor_consumer_lag", "Messages waiting in the input")
+        self._publish(lag=None, records=0)
+
+    @staticmethod
+    def _ewma(previous: Optional[float], value: float) -> float:
+        return value if previous is None else EWMA_ALPHA * value + (1 - EWMA_ALPHA) * previous
+
+    def observe(self, records: int, batch_ms: float, insert_ms: float, ack_ms: Optional[float], lag: Optional[int]):
+        """Record the outcome of one batch and adjust the parameters for the next one"""
+        self.batch_ms = self._ewma(self.batch_ms, batch_ms)
+        self.insert_ms = self._ewma(self.insert_ms, insert_ms)
+        if ack_ms is not None:
+            self.ack_ms = self._ewma(self.ack_ms, ack_ms)
+
+        if self.adaptive:
+            self._adjust(records, lag)
+        self._publish(lag, records)
+
+    def _adjust(self, records: int, lag: Optional[int]):
+        backlog = records >= self.batch_size or (lag is not None and lag > settings.batch_lag_threshold)
+
+        if self.batch_ms > self.target_ms:
+            self.batch_size = max(int(self.batch_size * DECREASE_FACTOR), self.min_records)
+        elif backlog:
+            self.batch_size = min(self.batch_size + self.increase_step, self.max_records)
+            self.linger_ms = min(self.linger_ms + self.min_linger_ms, self.max_linger_ms)
+        else:
+            self.linger_ms = max(self.linger_ms * DECREASE_FACTOR, self.min_linger_ms)
+
+    def _publish(self, lag: Optional[int], records: int):
+        metrics.set_gauge("log_processor_batch_size", self.batch_size)
+        metrics.set_gauge("log_processor_batch_linger_ms", round(self.linger_ms, 2))
+        if self.batch_ms is not None:
+            metrics.set_gauge("log_processor_batch_latency_ms", round(self.batch_ms, 3))
+        if self.insert_ms is not None:
+            metrics.set_gauge("log_processor_insert_latency_ms", round(self.insert_ms, 3))
+        if self.ack_ms is not None:
+            metrics.set_gauge("log_processor_fact_ack_latency_ms", round(self.ack_ms, 3))
+        if lag is not None:
+            metrics.set_gauge("log_processor_consumer_lag", lag)
+        if records:
+            metrics.inc("log_processor_batches_total")
+            metrics.inc("log_processor_logs_total", records)
@@ -1,10 +1,158 @@
+import asyncio
 import redis
+import redis.asyncio
 import json
+import logging
 from datetime import datetime, timedelta
-from typing import List
+from typing import Callable, Dict, List, Optional, Tuple
 from app.config import settings
+from app.processors.hash_ring import HashRing
 
-r = redis.Redis(host=settings.redis_host, port=settings.redis_port, decode_responses=True)
+logger = logging.getLogger(__name__)
+
+# Length of the per-source log history
+LOG_HISTORY_LENGTH = 200
+
+_shards = None
+
+
+def parse_nodes(value: str) -> List[str]:
+    """Split a comma-separated list of host:port addresses"""
+    return [node.strip() for node in value.split(",") if node.strip()]
+
+
+def _split_address(node: str) -> Tuple[str, int]:
+    host, _, port = node.rpartition(":")
+    return host, int(port)
+
+
+class RedisShards:
+    """Redis clients for one or more nodes, with per-source keys placed by source.
+
+    With several nodes, sources are assigned to nodes on a consistent-hash
+    ring, so adding a node only moves about 1/N of the sources. With Redis
+    Cluster the source is used as the hash tag of its keys instead, which
+    keeps all keys of a source in one slot.
+    """
+
+    def __init__(self, nodes: List[str], vnodes: int = 160, cluster: bool = False):
+        self.cluster = cluster
+        self.clients: Dict[str, redis.Redis] = {}
+        # Clients for the background tasks running on the event loop
+        self.async_clients: Dict[str, redis.asyncio.Redis] = {}
+        self.ring = HashRing(vnodes=vnodes)
+        if cluster:
+            from redis.cluster import RedisCluster
+            from redis.asyncio.cluster import RedisCluster as AsyncRedisCluster
+
+            host, port = _split_address(nodes[0])
+            self.clients[nodes[0]] = RedisCluster(host=host, port=port, decode_responses=True)
+            self.async_clients[nodes[0]] = AsyncRedisCluster(host=host, port=port, decode_responses=True)
+            self.ring.add(nodes[0])
+        else:
+            for node in nodes:
+                self.add_node(node)
+
+    def add_node(self, node: str):
+        if node in self.clients:
+            return
+        host, port = _split_address(node)
+        self.clients[node] = redis.Redis(host=host, port=port, decode_responses=True)
+        self.async_clients[node] = redis.asyncio.Redis(host=host, port=port, decode_responses=True)
+        self.ring.add(node)
+
+    def node_for(self, source: str) -> str:
+        return self.ring.node_for(source)
+
+    def client_for(self, source: str) -> redis.Redis:
+        return self.clients[self.node_for(source)]
+
+    def key(self, prefix: str, source: str) -> str:
+        return f"{prefix}:{{{source}}}" if self.cluster else f"{prefix}:{source}"
+
+    def _group(self, operations: List[Tuple[str, Callable]]) -> Dict[str, List[int]]:
+        by_node: Dict[str, List[int]] = {}
+        for index, (source, _) in enumerate(operations):
+            by_node.setdefault(self.node_for(source), []).append(index)
+        return by_node
+
+    @staticmethod
+    def _queue(pipe, operations: List[Tuple[str, Callable]], indexes: List[int]) -> List[int]:
+        counts = []
+        for index in indexes:
+            before = len(pipe)
+            operations[index][1](pipe)
+            counts.append(len(pipe) - before)
+        return counts
+
+    @staticmethod
+    def _split(results: List, indexes: List[int], counts: List[int], replies: list):
+        position = 0
+        for index, count in zip(indexes, counts):
+            results[index] = replies[position:position + count]
+            position += count
+
+    def execute_grouped(self, operations: List[Tuple[str, Callable]]) -> List[list]:
+        """Run operations with one pipeline per node.
+
+        Each operation is (source, fn) where fn queues commands on the given
+        pipeline; the replies are returned per operation, in order.
+        Operations on the same source keep their relative order.
+        """
+        results: List[Optional[list]] = [None] * len(operations)
+        for node, indexes in self._group(operations).items():
+            pipe = self.clients[node].pipeline(transaction=False)
+            counts = self._queue(pipe, operations, indexes)
+            self._split(results, indexes, counts, pipe.execute())
+        return results
+
+    async def execute_grouped_async(self, operations: List[Tuple[str, Callable]]) -> List[list]:
+        """``execute_grouped`` on the async clients, the node pipelines run concurrently"""
+        results: List[Optional[list]] = [None] * len(operations)
+
+        async def run(node: str, indexes: List[int]):
+            pipe = self.async_clients[node].pipeline(transaction=False)
+            counts = self._queue(pipe, operations, indexes)
+            self._split(results, indexes, counts, await pipe.execute())
+
+        await asyncio.gather(*(run(node, indexes) for node, indexes in self._group(operations).items()))
+        return results
+
+
+def get_shards() -> RedisShards:
+    """Redis nodes, connected on first use"""
+    global _shards
+    if _shards is None:
+        nodes = parse_nodes(settings.redis_nodes) or [f"{settings.redis_host}:{settings.redis_port}"]
+        _shards = RedisShards(nodes, vnodes=settings.redis_ring_vnodes, cluster=settings.redis_cluster)
+    return _shards
+
+
+def get_redis(source: str = "") -> redis.Redis:
+    """Redis client holding the keys of the given source"""
+    return get_shards().client_for(source)
+
+
+def warm_up_redis(connections: int):
+    """Open pooled connections to every node ahead of the first burst of logs"""
+    for node, client in get_shards().clients.items():
+        pool = getattr(client, "connection_pool", None)
+        if pool is None:
+            # Redis Cluster keeps one pool per cluster node
+            continue
+        opened = []
+        try:
+            for _ in range(connections):
+                connection = pool.get_connection()
+                opened.append(connection)
+                connection.send_command("PING")
+                connection.read_response()
+        except Exception as e:
+            # Fact generation already copes with Redis being down
+            logger.warning("Redis error in warm_up_redis (%s): %s", node, e)
+        finally:
+            for connection in opened:
+                pool.release(connection)
 
 def datetime_serializer(obj):
     """JSON serializer for datetime objects"""
@@ -12,58 +160,116 @@ def datetime_serializer(obj):
         return obj.isoformat()
     raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
 
+def _queue_push(pipe, shards: RedisShards, source: str, log: dict):
+    key = shards.key("logs", source)
+    # Use custom serializer to handle datetime objects
+    pipe.lpush(key, json.dumps(log, default=datetime_serializer))
+    pipe.ltrim(key, 0, LOG_HISTORY_LENGTH)  # Keep last 200 logs per source
+
+
 def push_log_history(source: str, log: dict):
     try:
-        key = f"logs:{source}"
-        # Use custom serializer to handle datetime objects
-        r.lpush(key, json.dumps(log, default=datetime_serializer))
-        r.ltrim(key, 0, 200)  # Keep last 200 logs per source
+        shards = get_shards()
+        pipe = shards.client_for(source).pipeline(transaction=False)
+        _queue_push(pipe, shards, source, log)
+        pipe.execute()
     except Exception as e:
         # If Redis is down, just continue without caching
-        print(f"Warning: Redis error in push_log_history: {e}")
+        logger.warning("Redis error in push_log_history: %s", e)
 
-def get_logs_within(source: str, within_seconds: int) -> List[dict]:
-    try:
-        key = f"logs:{source}"
-        logs = r.lrange(key, 0, -1)
-        
-        # Handle case where Redis returns None or empty
-        if not logs:
-            return []
-            
-        threshold = datetime.utcnow().timestamp() - within_seconds
-        result = []
-        
-        for log_str in logs:
-            try:
-                log_dict = json.loads(log_str)
-                if log_dict.get("timestamp"):
-                    log_timestamp = datetime.fromisoformat(log_dict["timestamp"]).timestamp()
-                    if log_timestamp > threshold:
-                        result.append(log_dict)
-            except (json.JSONDecodeError, ValueError, TypeError) as e:
-                # Skip malformed log entries
-                continue
-                
-        return result
-        
-    except Exception as e:
-        # If Redis is down or any other error, return empty list
-        print(f"Warning: Redis error in get_logs_within: {e}")
+def filter_logs_within(logs: List[str], within_seconds: int) -> List[dict]:
+    """Decode the raw history entries newer than within_seconds"""
+    # Handle case where Redis returns None or empty
+    if not logs:
         return []
 
+    threshold = datetime.utcnow().timestamp() - within_seconds
+    result = []
+
+    for log_str in logs:
+        try:
+            log_dict = json.loads(log_str)
+            if log_dict.get("timestamp"):
+                log_timestamp = datetime.fromisoformat(log_dict["timestamp"]).timestamp()
+                if log_timestamp > threshold:
+                    result.append(log_dict)
+        except (json.JSONDecodeError, ValueError, TypeError) as e:
+            # Skip malformed log entries
+            continue
+
+    return result
+
 def set_last_seen(source: str, ts: datetime):
     try:
         # Convert datetime to string before storing
-        r.set(f"last_seen:{source}", ts.isoformat())
+        get_redis(source).set(get_shards().key("last_seen", source), ts.isoformat())
     except Exception as e:
-        print(f"Warning: Redis error in set_last_seen: {e}")
+        logger.warning("Redis error in set_last_seen: %s", e)
 
 def get_last_seen(source: str) -> datetime:
     try:
-        val = r.get(f"last_seen:{source}")
+        val = get_redis(source).get(get_shards().key("last_seen", source))
         if val:
             return datetime.fromisoformat(val)
     except Exception as e:
-        print(f"Warning: Redis error in get_last_seen: {e}")
+        logger.warning("Redis error in get_last_seen: %s", e)
     return None
+
+def _record_commands(shards: RedisShards, source: str, log: dict, ts: datetime) -> Callable:
+    def queue(pipe):
+        pipe.get(shards.key("last_seen", source))
+        _queue_push(pipe, shards, source, log)
+        pipe.set(shards.key("last_seen", source), ts.isoformat())
+        pipe.lrange(shards.key("logs", source), 0, -1)
+    return queue
+
+def record_logs(entries: List[Tuple[str, dict, datetime]]) -> List[Tuple[Optional[datetime], List[str]]]:
+    """Record (source, log, timestamp) entries in the log history, one pipeline per node.
+
+    For each entry returns the last seen time of its source before the entry
+    and the raw history including it, as if the entries had been recorded one
+    by one.
+    """
+    try:
+        shards = get_shards()
+        replies = shards.execute_grouped([
+            (source, _record_commands(shards, source, log, ts)) for source, log, ts in entries
+        ])
+    except Exception as e:
+        # If Redis is down, facts are generated without history
+        logger.warning("Redis error in record_logs: %s", e)
+        return [(None, [])] * len(entries)
+
+    results = []
+    for reply in replies:
+        last_seen, history = reply[0], reply[-1]
+        results.append((datetime.fromisoformat(last_seen) if last_seen else None, history or []))
+    return results
+
+def _sketch_commands(shards: RedisShards, source: str, worker_id: str, sketch: Optional[dict], ttl_seconds: int) -> Callable:
+    def queue(pipe):
+        key = shards.key("latency_sketch", source)
+        if sketch is not None:
+            pipe.hset(key, worker_id, json.dumps(sketch))
+            pipe.expire(key, ttl_seconds)
+        pipe.hgetall(key)
+    return queue
+
+async def sync_latency_sketches(sketches: Dict[str, Optional[dict]], worker_id: str, ttl_seconds: int) -> Dict[str, Dict[str, dict]]:
+    """Publish this worker's sketch of each source (None skips it) and read back every worker's sketches.
+
+    One pipeline per node, on the async clients.
+    """
+    try:
+        shards = get_shards()
+        sources = list(sketches)
+        replies = await shards.execute_grouped_async([
+            (source, _sketch_commands(shards, source, worker_id, sketches[source], ttl_seconds)) for source in sources
+        ])
+    except Exception as e:
+        logger.warning("Redis error in sync_latency_sketches: %s", e)
+        return {}
+    return {
+        source: {worker: json.loads(data) for worker, data in (reply[-1] or {}).items()}
+        for source, reply in zip(sources, replies)
+    }
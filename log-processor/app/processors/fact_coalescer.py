@@ -0,0 +1,138 @@
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.models.fact_model import Fact
+
+logger = logging.getLogger(__name__)
+
+# Levels that always produce a fact right away
+IMMEDIATE_LEVELS = {"ERROR", "WARN", "WARNING", "CRITICAL"}
+
+# Boolean facts that always produce a fact right away when set
+IMMEDIATE_FLAGS = ("is_silent", "failed_syscall", "potential_scraper")
+
+# Numeric conditions of the anomaly-detector rules (anomaly-detector/rules/*.json),
+# used when no rules directory is configured: a fact whose counter starts to
+# satisfy one of them is emitted right away
+RULE_THRESHOLDS: Dict[str, Tuple[str, float]] = {
+    "recent_error_count": ("greaterThanInclusive", 5),
+    "recent_warn_count": ("greaterThanInclusive", 10),
+    "repeated_error_count": ("greaterThanInclusive", 3),
+    "unauthorized_count": ("greaterThanInclusive", 3),
+    "log_frequency_last_minute": ("greaterThanInclusive", 100),
+    "performance_latency": ("greaterThan", 2000),
+    "latency_p95": ("greaterThan", 1000),
+}
+
+OPERATORS = {
+    "greaterThan": lambda value, threshold: value > threshold,
+    "greaterThanInclusive": lambda value, threshold: value >= threshold,
+}
+
+# Sources without a fact for this long lose their previous counter values
+IDLE_SOURCE_SEC = 600
+
+
+def _numeric_conditions(condition: dict) -> Iterator[Tuple[str, str, float]]:
+    """(fact, operator, value) of the threshold conditions nested in ``all``/``any`` blocks"""
+    # "not" blocks are skipped, their conditions fire below the value and never make a rising counter notable
+    for nested in condition.get("all", []) + condition.get("any", []):
+        yield from _numeric_conditions(nested)
+    operator, value = condition.get("operator"), condition.get("value")
+    if operator in OPERATORS and isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield condition["fact"], operator, value
+
+
+def load_rule_thresholds(directory: str) -> Dict[str, Tuple[str, float]]:
+    """Numeric ``greaterThan``/``greaterThanInclusive`` conditions of the json-rules-engine rules in a directory"""
+    thresholds = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(directory, name)) as f:
+            rule = json.load(f)
+        for fact, operator, value in _numeric_conditions(rule.get("conditions", {})):
+            # The loosest condition on a fact decides when it first matters
+            if fact not in thresholds or value < thresholds[fact][1]:
+                thresholds[fact] = (operator, value)
+    return thresholds
+
+
+class FactCoalescer:
+    """Collapses uneventful facts into one summary fact per source per tick.
+
+    ``offer`` returns the fact when it has to go out immediately, otherwise it
+    is held back and ``drain`` (called once per tick) returns the latest fact
+    of every source along with the number of logs it stands for and the
+    highest latency seen over them.
+    """
+
+    def __init__(self, rules_dir: str = ""):
+        self.thresholds = RULE_THRESHOLDS
+        if rules_dir:
+            self.thresholds = load_rule_thresholds(rules_dir)
+            logger.info("Fact coalescing thresholds loaded from %s: %s", rules_dir, self.thresholds)
+        self.pending: Dict[str, Fact] = {}
+        self.pending_counts: Dict[str, int] = {}
+        self.pending_latency: Dict[str, float] = {}
+        # Source -> (time of its last fact, counter values of that fact)
+        self.previous_values: Dict[str, Tuple[float, Dict[str, float]]] = {}
+        self.evicted_at = time.monotonic()
+
+    def offer(self, fact: Fact) -> Optional[Fact]:
+        crossed = self._crossed_threshold(fact)
+        if crossed or self._is_notable(fact):
+            return fact
+
+        source = fact.source
+        self.pending[source] = fact
+        self.pending_counts[source] = self.pending_counts.get(source, 0) + 1
+        if fact.performance_latency is not None:
+            self.pending_latency[source] = max(self.pending_latency.get(source, 0), fact.performance_latency)
+        return None
+
+    def drain(self) -> List[Fact]:
+        summaries = []
+        for source, fact in self.pending.items():
+            update = {"coalesced_count": self.pending_counts[source]}
+            if source in self.pending_latency:
+                update["performance_latency"] = self.pending_latency[source]
+            summaries.append(fact.model_copy(update=update))
+        self.pending = {}
+        self.pending_counts = {}
+        self.pending_latency = {}
+        self._evict_idle()
+        return summaries
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        if now - self.evicted_at < IDLE_SOURCE_SEC:
+            return
+        self.evicted_at = now
+        cutoff = now - IDLE_SOURCE_SEC
+        for source in [s for s, (seen_at, _) in self.previous_values.items() if seen_at < cutoff]:
+            del self.previous_values[source]
+
+    def _is_notable(self, fact: Fact) -> bool:
+        if (fact.log_level or "").upper() in IMMEDIATE_LEVELS:
+            return True
+        if fact.matched_pattern:
+            return True
+        return any(getattr(fact, flag) for flag in IMMEDIATE_FLAGS)
+
+    def _crossed_threshold(self, fact: Fact) -> bool:
+        """Compare counters against the previous fact of the same source"""
+        _, previous = self.previous_values.get(fact.source, (0, {}))
+        current = {}
+        crossed = False
+        for field, (operator, threshold) in self.thresholds.items():
+            value = getattr(fact, field, None) or 0
+            current[field] = value
+            matches = OPERATORS[operator]
+            if matches(value, threshold) and not matches(previous.get(field, 0), threshold):
+                crossed = True
+        self.previous_values[fact.source] = (time.monotonic(), current)
+        return crossed
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import logging
+import os
+import re
+from typing import List, Optional, Pattern
+
+from pydantic import BaseModel, Field, ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+class FactPolicy(BaseModel):
+    """Patterns, windows and thresholds used by the fact generator"""
+
+    suspicious_patterns: List[str] = Field(default_factory=lambda: [
+        r"unauthorized", r"login failed", r"403", r"panic:", r"segfault",
+        r"sql injection", r"out of memory", r"oom", r"failed to connect",
+        r"timeout", r"connection refused", r"disk full",
+    ])
+    unauthorized_keywords: List[str] = Field(default_factory=lambda: ["unauthorized", "login failed", "403"])
+    failed_syscall_patterns: List[str] = Field(default_factory=lambda: [
+        r"failed to connect", r"timeout", r"connection refused", r"disk full",
+    ])
+
+    error_window_sec: int = 120
+    warn_window_sec: int = 300
+    repeated_error_window_sec: int = 120
+    unauthorized_window_sec: int = 300
+    scraper_window_sec: int = 60
+
+    scraper_min_gets: int = 20
+    scraper_min_distinct_urls: int = 15
+    silence_threshold_minutes: int = 10
+
+    model_config = {"extra": "forbid", "frozen": True}
+
+
+class CompiledFactPolicy:
+    """A policy with its patterns compiled, built off the event loop and swapped in whole"""
+
+    def __init__(self, policy: FactPolicy):
+        self.policy = policy
+        self.suspicious = [(pattern, re.compile(pattern, re.IGNORECASE)) for pattern in policy.suspicious_patterns]
+        # One pass over the message rules out the common case of no match at all
+        self.any_suspicious = self._alternation(policy.suspicious_patterns)
+        self.failed_syscall = self._alternation(policy.failed_syscall_patterns)
+        self.unauthorized_keywords = [keyword.lower() for keyword in policy.unauthorized_keywords]
+
+    @staticmethod
+    def _alternation(patterns: List[str]) -> Optional[Pattern]:
+        if not patterns:
+            return None
+        return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+
+    def match_suspicious(self, message: str) -> Optional[str]:
+        """First pattern of the list matching the message"""
+        if self.any_suspicious is None or not self.any_suspicious.search(message):
+            return None
+        for pattern, regex in self.suspicious:
+            if regex.search(message):
+                return pattern
+        return None
+
+    def has_failed_syscall(self, message: str) -> bool:
+        return self.failed_syscall is not None and bool(self.failed_syscall.search(message))
+
+
+def load_fact_policy(path: str) -> CompiledFactPolicy:
+    """Read and compile a policy file, raises ValueError if it is invalid"""
+    with open(path) as f:
+        try:
+            policy = FactPolicy(**json.load(f))
+        except (ValidationError, TypeError) as e:
+            raise ValueError(str(e)) from e
+    try:
+        return CompiledFactPolicy(policy)
+    except re.error as e:
+        raise ValueError(f"invalid pattern: {e}") from e
+
+
+class FactPolicyStore:
+    """Holds the active policy and a newly compiled one waiting to be switched in.
+
+    The watcher compiles changes in a worker thread and stages them; the
+    processor calls ``activate_pending`` between batches so every batch is
+    handled with a single policy.
+    """
+
+    def __init__(self):
+        self.path = None
+        self.current = CompiledFactPolicy(FactPolicy())
+        self.pending: Optional[CompiledFactPolicy] = None
+        self.version = None
+
+    def activate_pending(self):
+        pending = self.pending
+        if pending is not None:
+            self.pending = None
+            self.current = pending
+            logger.info("Fact policy switched over")
+
+    def _file_version(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def load_now(self, path: str):
+        """Load the policy file synchronously at startup"""
+        self.path = path
+        self.version = self._file_version()
+        if self.version is None:
+            logger.info("No fact policy file at %s, using the built-in policy", self.path)
+            return
+        try:
+            self.current = load_fact_policy(self.path)
+            logger.info("Fact policy loaded from %s", self.path)
+        except (OSError, ValueError) as e:
+            logger.error("Ignoring invalid fact policy in %s, using the built-in policy: %s", self.path, e)
+
+    async def watch(self, interval_sec: float):
+        """Poll the policy file and stage a recompiled policy when it changes"""
+        while True:
+            await asyncio.sleep(interval_sec)
+            version = self._file_version()
+            if version == self.version:
+                continue
+            self.version = version
+            if version is None:
+                logger.warning("Fact policy file %s was removed, keeping the active policy", self.path)
+                continue
+            try:
+                self.pending = await asyncio.to_thread(load_fact_policy, self.path)
+                logger.info("Fact policy change in %s compiled, switching over at the next batch", self.path)
+            except (OSError, ValueError) as e:
+                logger.error("Ignoring invalid fact policy in %s: %s", self.path, e)
+
+
+fact_policy = FactPolicyStore()
@@ -1,35 +1,37 @@
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 from app.models.log_model import LogModel
 from app.models.fact_model import Fact
-from app.processors.cache import get_logs_within, push_log_history, get_last_seen, set_last_seen
+from app.processors.cache import filter_logs_within, record_logs
+from app.processors.latency_sketch import latency_tracker
+from app.processors.fact_policy import CompiledFactPolicy, fact_policy
 from datetime import datetime, timedelta
 import re
 
-SUSPICIOUS_PATTERNS = [
-    r"unauthorized", r"login failed", r"403", r"panic:", r"segfault",
-    r"sql injection", r"out of memory", r"oom", r"failed to connect",
-    r"timeout", r"connection refused", r"disk full"
-]
+# Patterns, windows and thresholds live in the fact policy file (see fact_policy.py)
 
+# log_frequency_last_minute is a fixed window, the logFrequencySpike rule threshold assumes one minute
+FREQUENCY_WINDOW_SEC = 60
 
-ERROR_WINDOW_SEC = 120
-WARN_WINDOW_SEC = 300
-REPEATED_ERROR_WINDOW_SEC = 120
-UNAUTHORIZED_WINDOW_SEC = 300
-SCRAPER_WINDOW_SEC = 60
+def source_of(log: LogModel) -> str:
+    return log.source or log.hostname or 'source-not-passed'
 
-SCRAPER_MIN_GETS = 20
-SCRAPER_MIN_DISTINCT_URLS = 15
-SILENCE_THRESHOLD_MINUTES = 10
-
-def safe_get_logs(source: str, seconds: int) -> List[Dict]:
-    """Fetch logs within given time window, always returns a list."""
-    return get_logs_within(source, seconds) or []
+def generators_for(logs: List[LogModel]) -> List["FactGenerator"]:
+    """Record a batch of logs in the history, one Redis pipeline per node, and prepare their facts"""
+    policy = fact_policy.current
+    histories = record_logs([(source_of(log), log.model_dump(mode='json'), log.timestamp) for log in logs])
+    return [FactGenerator(log, policy, history) for log, history in zip(logs, histories)]
 
 class FactGenerator:
-    def __init__(self, log: LogModel):
+    def __init__(self, log: LogModel, policy: Optional[CompiledFactPolicy] = None,
+                 history: Optional[Tuple[Optional[datetime], List[str]]] = None):
         self.log = log
-        self.source = log.source or log.hostname or 'source-not-passed'
+        self.source = source_of(log)
+        # Resolved once so a fact never mixes two policies
+        self.compiled = policy or fact_policy.current
+        self.policy = self.compiled.policy
+        # (last seen before this log, raw history including it), recorded by generators_for
+        self.history = history
+        self._windows: Dict[int, List[Dict]] = {}
 
     @staticmethod
     def normalize_message(message: str) -> str:
@@ -41,28 +43,30 @@ class FactGenerator:
         ).strip()
 
     def generate_facts_from_log(self) -> Fact:
-        # --- Silence detection (fetch last_seen before updating it) ---
-        previous_last_seen = get_last_seen(self.source)
-        is_silent = self._detect_silence(previous_last_seen)
+        # Read last_seen and push the current log to history in one round trip
+        if self.history is None:
+            self.history = record_logs([(self.source, self.log.model_dump(mode='json'), self.log.timestamp)])[0]
+        previous_last_seen, _ = self.history
 
-        # Push current log to history (after silence detection)
-        push_log_history(self.source, self.log.model_dump(mode='json'))
-        set_last_seen(self.source, self.log.timestamp)
+        # --- Silence detection (last_seen from before this log) ---
+        is_silent = self._detect_silence(previous_last_seen)
 
         # Fetch logs for different windows
-        last_2min = safe_get_logs(self.source, ERROR_WINDOW_SEC)
-        last_5min = safe_get_logs(self.source, WARN_WINDOW_SEC)
-        last_1min = safe_get_logs(self.source, SCRAPER_WINDOW_SEC)
+        error_window = self._logs_within(self.policy.error_window_sec)
+        warn_window = self._logs_within(self.policy.warn_window_sec)
+        scraper_window = self._logs_within(self.policy.scraper_window_sec)
 
         # Compute facts
-        error_count = self._count_logs_by_level(last_2min, "ERROR")
-        warn_count = self._count_logs_by_level(last_5min, "WARN")
-        repeated_error_count = self._count_repeated_errors(last_2min)
-        unauthorized_count = self._count_unauthorized(last_5min)
+        error_count = self._count_logs_by_level(error_window, "ERROR")
+        warn_count = self._count_logs_by_level(warn_window, "WARN")
+        repeated_error_count = self._count_repeated_errors(self._logs_within(self.policy.repeated_error_window_sec))
+        unauthorized_count = self._count_unauthorized(self._logs_within(self.policy.unauthorized_window_sec))
         failed_syscall = self._has_failed_syscall()
         matched_pattern = self._match_suspicious_pattern()
-        potential_scraper = self._detect_scraper(last_1min)
+        potential_scraper = self._detect_scraper(scraper_window)
         latency = self._get_latency()
+        latency_tracker.record(self.source, latency)
+        latency_p50, latency_p95, latency_p99 = latency_tracker.percentiles(self.source)
 
         return Fact(
             timestamp=self.log.timestamp,
@@ -76,13 +80,22 @@ class FactGenerator:
             failed_syscall=failed_syscall,
             matched_pattern=matched_pattern,
             is_silent=is_silent,
-            log_frequency_last_minute=len(last_1min),
+            log_frequency_last_minute=len(self._logs_within(FREQUENCY_WINDOW_SEC)),
             potential_scraper=potential_scraper,
-            performance_latency=latency
+            performance_latency=latency,
+            latency_p50=latency_p50,
+            latency_p95=latency_p95,
+            latency_p99=latency_p99
         )
 
     # === Helper Methods ===
 
+    def _logs_within(self, seconds: int) -> List[Dict]:
+        # Every window is cut from the history read when the log was recorded
+        if seconds not in self._windows:
+            self._windows[seconds] = filter_logs_within(self.history[1], seconds)
+        return self._windows[seconds]
+
     def _count_logs_by_level(self, logs: List[Dict], level: str) -> int:
         return sum(1 for l in logs if l.get("log_level") == level)
 
@@ -95,43 +108,30 @@ class FactGenerator:
         )
 
     def _count_unauthorized(self, logs: List[Dict]) -> int:
-        keywords = ["unauthorized", "login failed", "403"]
+        keywords = self.compiled.unauthorized_keywords
         return sum(
             1 for l in logs
             if any(k in (l.get("message") or "").lower() for k in keywords)
         )
 
     def _has_failed_syscall(self) -> bool:
-        return bool(
-            re.search(
-                r"(failed to connect|timeout|connection refused|disk full)",
-                self.log.message or "",
-                re.IGNORECASE
-            )
-        )
+        return self.compiled.has_failed_syscall(self.log.message or "")
 
     def _match_suspicious_pattern(self) -> Optional[str]:
-        for pattern in SUSPICIOUS_PATTERNS:
-            try:
-                if re.search(pattern, self.log.message or "", re.IGNORECASE):
-                    return pattern
-            except re.error:
-                # Skip malformed regex
-                continue
-        return None
+        return self.compiled.match_suspicious(self.log.message or "")
 
     def _detect_silence(self, last_seen) -> bool:
         if not last_seen:
             return False
-        silence_threshold = self.log.timestamp - timedelta(minutes=SILENCE_THRESHOLD_MINUTES)
+        silence_threshold = self.log.timestamp - timedelta(minutes=self.policy.silence_threshold_minutes)
         return last_seen < silence_threshold
 
     def _detect_scraper(self, logs: List[Dict]) -> bool:
         get_requests = [l for l in logs if l.get("http_method") == "GET"]
         distinct_urls = {l.get("http_url") for l in get_requests if l.get("http_url")}
         return (
-                len(get_requests) >= SCRAPER_MIN_GETS and
-                len(distinct_urls) >= SCRAPER_MIN_DISTINCT_URLS
+                len(get_requests) >= self.policy.scraper_min_gets and
+                len(distinct_urls) >= self.policy.scraper_min_distinct_urls
         )
 
     def _get_latency(self) -> Optional[float]:
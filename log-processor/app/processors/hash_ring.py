@@ -0,0 +1,51 @@
+import bisect
+import hashlib
+from typing import Dict, Iterable, List
+
+
+def _hash(value: str) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring mapping keys to nodes.
+
+    Each node is placed on the ring ``vnodes`` times; a key belongs to the
+    first node point at or after its hash. Adding a node only moves the keys
+    that fall on its new points, about 1/N of them.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 160):
+        self.vnodes = vnodes
+        self.points: List[int] = []
+        self.owners: Dict[int, str] = {}
+        self.nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str):
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for i in range(self.vnodes):
+            point = _hash(f"{node}#{i}")
+            if point in self.owners:
+                continue
+            self.owners[point] = node
+            bisect.insort(self.points, point)
+
+    def remove(self, node: str):
+        if node not in self.nodes:
+            return
+        self.nodes.remove(node)
+        self.points = [point for point in self.points if self.owners[point] != node]
+        self.owners = {point: owner for point, owner in self.owners.items() if owner != node}
+
+    def node_for(self, key: str) -> str:
+        if not self.points:
+            raise ValueError("hash ring has no nodes")
+        index = bisect.bisect_left(self.points, _hash(key))
+        if index == len(self.points):
+            index = 0
+        return self.owners[self.points[index]]
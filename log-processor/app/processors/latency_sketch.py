@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import math
+import os
+import socket
+import time
+from collections import deque
+from typing import Dict, Optional, Set, Tuple
+
+from app.processors.cache import sync_latency_sketches
+
+logger = logging.getLogger(__name__)
+
+# Relative accuracy of the quantile estimates (1%)
+RELATIVE_ACCURACY = 0.01
+# Latencies are clamped to this range so the number of buckets stays bounded
+MIN_TRACKED_LATENCY = 0.01
+MAX_TRACKED_LATENCY = 3_600_000.0
+
+LATENCY_WINDOW_SEC = 300
+LATENCY_SLOT_SEC = 30
+LATENCY_PUBLISH_INTERVAL_SEC = 5
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class DDSketch:
+    """Mergeable quantile sketch with logarithmic buckets (DDSketch).
+
+    Every value lands in bucket ``ceil(log_gamma(value))``; quantiles read back
+    from the bucket midpoints are within ``RELATIVE_ACCURACY`` of the true value.
+    Adding a value is O(1), and memory is bounded by the clamped value range
+    (about 1200 buckets at 1% accuracy).
+    """
+
+    gamma = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    log_gamma = math.log(gamma)
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _index(self, value: float) -> int:
+        value = min(value, MAX_TRACKED_LATENCY)
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def _bucket_value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1):
+        if value < MIN_TRACKED_LATENCY:
+            self.zero_count += count
+        else:
+            index = self._index(value)
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+
+    def merge(self, other: "DDSketch"):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def subtract(self, other: "DDSketch"):
+        """Remove a sketch that was previously merged into this one"""
+        for index, count in other.buckets.items():
+            remaining = self.buckets.get(index, 0) - count
+            if remaining > 0:
+                self.buckets[index] = remaining
+            else:
+                self.buckets.pop(index, None)
+        self.zero_count = max(self.zero_count - other.zero_count, 0)
+        self.count = max(self.count - other.count, 0)
+
+    def quantiles(self, *qs: float) -> Tuple[Optional[float], ...]:
+        """Return one estimate per requested quantile in a single bucket scan"""
+        if self.count == 0:
+            return tuple(None for _ in qs)
+
+        ranks = [q * (self.count - 1) for q in qs]
+        results: list = [None] * len(qs)
+        pending = sorted(range(len(qs)), key=lambda i: ranks[i])
+
+        seen = self.zero_count
+        while pending and ranks[pending[0]] < seen:
+            results[pending.pop(0)] = 0.0
+
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            while pending and ranks[pending[0]] < seen:
+                results[pending.pop(0)] = self._bucket_value(index)
+            if not pending:
+                break
+
+        return tuple(results)
+
+    def to_dict(self) -> dict:
+        return {
+            "buckets": {str(index): count for index, count in self.buckets.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DDSketch":
+        sketch = cls()
+        sketch.buckets = {int(index): int(count) for index, count in data.get("buckets", {}).items()}
+        sketch.zero_count = int(data.get("zero_count", 0))
+        sketch.count = int(data.get("count", 0))
+        return sketch
+
+
+class SlidingLatencyWindow:
+    """Sliding window made of fixed time slots, each holding its own sketch.
+
+    ``total`` is kept equal to the merge of all live slots, so a query never
+    has to re-merge the window.
+    """
+
+    def __init__(self, window_sec: int = LATENCY_WINDOW_SEC, slot_sec: int = LATENCY_SLOT_SEC):
+        self.slot_sec = slot_sec
+        self.max_slots = max(window_sec // slot_sec, 1)
+        self.slots: deque = deque()
+        self.total = DDSketch()
+
+    def _expire(self, current_slot: int):
+        while self.slots and self.slots[0][0] <= current_slot - self.max_slots:
+            _, expired = self.slots.popleft()
+            self.total.subtract(expired)
+
+    def add(self, value: float, now: float):
+        current_slot = int(now // self.slot_sec)
+        self._expire(current_slot)
+        if not self.slots or self.slots[-1][0] != current_slot:
+            self.slots.append((current_slot, DDSketch()))
+        self.slots[-1][1].add(value)
+        self.total.add(value)
+
+    def snapshot(self, now: float) -> DDSketch:
+        self._expire(int(now // self.slot_sec))
+        return self.total
+
+
+class LatencyTracker:
+    """Per-source latency windows, shared with other workers through Redis.
+
+    A background task periodically publishes this worker's window of every
+    source seen since the last sync and reads back the windows of the other
+    workers in one async pipeline per node, so percentiles reflect the whole
+    consumer group without a Redis round trip on the ingest path.
+    """
+
+    def __init__(self):
+        self.windows: Dict[str, SlidingLatencyWindow] = {}
+        self.remote: Dict[str, DDSketch] = {}
+        self.last_synced: Dict[str, float] = {}
+        # Sources whose facts were computed since the last sync
+        self.active: Set[str] = set()
+
+    def record(self, source: str, latency: Optional[float]):
+        if latency is None:
+            return
+        try:
+            value = float(latency)
+        except (TypeError, ValueError):
+            return
+        if value < 0:
+            return
+        window = self.windows.get(source)
+        if window is None:
+            window = self.windows[source] = SlidingLatencyWindow()
+        window.add(value, time.time())
+
+    def percentiles(self, source: str) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+        """Return (p50, p95, p99) for the source over the sliding window"""
+        now = time.time()
+        self.active.add(source)
+        window = self.windows.get(source)
+
+        local = window.snapshot(now) if window is not None else DDSketch()
+        remote = self.remote.get(source)
+        if remote is None or remote.count == 0:
+            return local.quantiles(0.5, 0.95, 0.99)
+
+        sketch = DDSketch()
+        sketch.merge(local)
+        sketch.merge(remote)
+        return sketch.quantiles(0.5, 0.95, 0.99)
+
+    async def sync(self):
+        """Publish the windows of the active sources and refresh their remote sketches"""
+        now = time.time()
+        sources, self.active = self.active, set()
+        payloads = {}
+        for source in sources:
+            window = self.windows.get(source)
+            payload = None
+            if window is not None:
+                payload = window.snapshot(now).to_dict()
+                payload["published_at"] = now
+            payloads[source] = payload
+            self.last_synced[source] = now
+
+        if payloads:
+            for source, workers in (await sync_latency_sketches(payloads, WORKER_ID, LATENCY_WINDOW_SEC)).items():
+                remote = DDSketch()
+                for worker_id, data in workers.items():
+                    # Skip our own entry and entries left behind by workers that went away
+                    if worker_id == WORKER_ID or now - data.get("published_at", 0) > LATENCY_WINDOW_SEC:
+                        continue
+                    remote.merge(DDSketch.from_dict(data))
+                self.remote[source] = remote
+
+        self._evict_idle(now)
+
+    def _evict_idle(self, now: float):
+        """Drop sources whose window has fully expired, keeping memory bounded"""
+        idle = [source for source, window in self.windows.items() if window.snapshot(now).count == 0]
+        for source in idle:
+            del self.windows[source]
+        for source in [s for s in self.last_synced if now - self.last_synced[s] > LATENCY_WINDOW_SEC]:
+            self.last_synced.pop(source, None)
+            self.remote.pop(source, None)
+
+    async def run(self):
+        """Background task syncing with the other workers every LATENCY_PUBLISH_INTERVAL_SEC"""
+        while True:
+            await asyncio.sleep(LATENCY_PUBLISH_INTERVAL_SEC)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.warning("Latency sketch sync failed: %s", e)
+
+
+latency_tracker = LatencyTracker()
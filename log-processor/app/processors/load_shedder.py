@@ -0,0 +1,82 @@
+import logging
+import random
+from typing import List, Optional, Tuple
+
+from app.models.log_model import LogModel
+from app.monitoring.metrics import metrics
+from app.processors.fact_policy import fact_policy
+
+logger = logging.getLogger(__name__)
+
+# Levels that are always stored right away
+PRIORITY_LEVELS = {"ERROR", "WARN", "WARNING", "CRITICAL", "FATAL"}
+# Overload ends once lag and queue depth are below this share of their thresholds
+EXIT_RATIO = 0.5
+
+
+class LoadShedder:
+    """Keeps storage of high-priority logs current while the processor is far behind.
+
+    Overload starts when the consumer lag or the tenant queue depth crosses
+    its threshold and ends once both are back under half of it. While
+    overloaded, ERROR/WARN/CRITICAL logs and logs matching a suspicious
+    pattern are stored as usual; the rows of other logs are either sampled
+    (kept rows carry ``sample_weight = 1 / sample_rate`` so counts can be
+    corrected) or deferred to the disk spool and stored after the overload.
+    Facts and window counters are still computed for every log.
+    """
+
+    def __init__(self, lag_threshold: int, queue_threshold: int, mode: str, sample_rate: float):
+        if mode not in ("sample", "defer"):
+            raise ValueError(f"Unsupported load shedding mode: {mode}")
+        if not 0 < sample_rate <= 1:
+            raise ValueError("load shedding sample rate must be in (0, 1]")
+        self.lag_threshold = lag_threshold
+        self.queue_threshold = queue_threshold
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.overloaded = False
+
+        metrics.describe("log_processor_overloaded", "1 while low-priority log rows are being shed")
+        metrics.describe("log_processor_shed_logs_total", "Low-priority log rows not stored right away, by action")
+        metrics.set_gauge("log_processor_overloaded", 0)
+
+    def _over(self, value: Optional[int], threshold: int, ratio: float) -> bool:
+        return bool(threshold) and value is not None and value > threshold * ratio
+
+    def update(self, lag: Optional[int], queued: Optional[int]):
+        """Enter or leave overload from the latest consumer lag and queue depth"""
+        if not self.overloaded:
+            if self._over(lag, self.lag_threshold, 1) or self._over(queued, self.queue_threshold, 1):
+                self.overloaded = True
+                logger.warning("Overload: shedding low-priority log rows (%s), lag %s, queued %s", self.mode, lag, queued)
+        elif not (self._over(lag, self.lag_threshold, EXIT_RATIO) or self._over(queued, self.queue_threshold, EXIT_RATIO)):
+            self.overloaded = False
+            logger.info("Overload over: storing every log again, lag %s, queued %s", lag, queued)
+        metrics.set_gauge("log_processor_overloaded", int(self.overloaded))
+
+    def is_priority(self, log: LogModel) -> bool:
+        if (log.log_level or "").upper() in PRIORITY_LEVELS:
+            return True
+        return fact_policy.current.match_suspicious(log.message or "") is not None
+
+    def split(self, logs: List[LogModel]) -> Tuple[List[LogModel], List[LogModel]]:
+        """Return (logs to store now, logs whose rows are shed)"""
+        if not self.overloaded:
+            return logs, []
+
+        store, shed = [], []
+        weight = 1 / self.sample_rate
+        for log in logs:
+            if self.is_priority(log):
+                store.append(log)
+            elif self.mode == "sample" and random.random() < self.sample_rate:
+                log.sample_weight = weight
+                store.append(log)
+            else:
+                shed.append(log)
+
+        if shed:
+            action = "deferred" if self.mode == "defer" else "sampled_out"
+            metrics.inc("log_processor_shed_logs_total", len(shed), {"action": action})
+        return store, shed
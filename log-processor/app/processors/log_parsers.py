@@ -0,0 +1,279 @@
+import json
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from app.monitoring.metrics import metrics
+
+# Other keys the LogModel reads these fields from, a parsed value only fills a field none of them set
+FIELD_ALIASES = {
+    "timestamp": ("@timestamp",),
+    "source": ("app_source", "service", "container_name"),
+    "hostname": ("host", "container_name"),
+    "log_level": ("level", "severity"),
+}
+
+# nginx "combined" format, optionally followed by extra fields such as $request_time
+NGINX_ACCESS = re.compile(
+    r'^(?P<ip>\S+) \S+ (?P<user>\S+) \[(?P<time>[^\]]+)\] "(?P<request>[^"]*)" '
+    r'(?P<status>\d{3}) (?P<bytes>\d+|-) "(?P<referer>[^"]*)" "(?P<agent>[^"]*)"(?: (?P<rest>.*))?$'
+)
+# "2026/10/19 12:00:00 [error] 31#31: *5 message, client: 1.2.3.4, server: _, request: "GET / HTTP/1.1""
+NGINX_ERROR = re.compile(r"^\d{4}/\d\d/\d\d \d\d:\d\d:\d\d \[(?P<level>\w+)\] \d+#\d+: ")
+NGINX_ERROR_CLIENT = re.compile(r", client: ([^,]+)")
+NGINX_ERROR_REQUEST = re.compile(r', request: "([^"]*)"')
+NGINX_LEVELS = {
+    "debug": "DEBUG", "info": "INFO", "notice": "INFO", "warn": "WARN",
+    "error": "ERROR", "crit": "CRITICAL", "alert": "CRITICAL", "emerg": "CRITICAL",
+}
+# Extra access log fields holding the request time in seconds
+REQUEST_TIME_KEYS = ("rt", "request_time")
+
+# journald PRIORITY, 0 (emerg) to 7 (debug)
+SYSLOG_PRIORITIES = ["CRITICAL", "CRITICAL", "CRITICAL", "ERROR", "WARN", "INFO", "INFO", "DEBUG"]
+SSHD_AUTH = re.compile(
+    r"^(?:(?P<result>Failed|Accepted) \S+ for (?:invalid user )?|Invalid user )(?P<user>\S+) from (?P<ip>\S+)"
+)
+SSHD_EVENTS = {"Failed": "auth_failure", "Accepted": "auth_success", None: "auth_failure"}
+
+# "2026-10-19T12:00:00Z ERROR ...", "[ERROR] ...", "level=error ..." at the start of an application line
+LEADING_LEVEL = re.compile(
+    r"^(?:\d\S* (?:\d\d:\d\d:\d\d\S* )?)?(?:\[|level=)?(?P<level>debug|info|warn|warning|error|critical|fatal)\b",
+    re.IGNORECASE,
+)
+LEVEL_NAMES = {"warning": "WARN", "fatal": "CRITICAL"}
+
+
+def _cache_put(cache: Dict, size: int, key, value):
+    # Cleared rather than evicted one by one, the hot keys come back within a few lines
+    if size <= 0:
+        return value
+    if len(cache) >= size:
+        cache.clear()
+    cache[key] = value
+    return value
+
+
+class NginxParser:
+    """nginx access (combined format) and error log lines.
+
+    Request lines and the minute part of the access time repeat across
+    consecutive lines, their parsed values are cached.
+    """
+
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        self.requests: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        self.minutes: Dict[str, Optional[datetime]] = {}
+
+    def parse(self, line: str, log_data: Dict) -> Optional[Dict[str, Any]]:
+        match = NGINX_ACCESS.match(line)
+        if match is None:
+            return self._parse_error(line)
+
+        ip, user, time_local, request, status, _, _, agent, rest = match.groups()
+        method, url = self._request(request)
+        fields = {
+            "source": "nginx",
+            "source_ip": ip,
+            "username": None if user == "-" else user,
+            "http_method": method,
+            "http_url": url,
+            "http_status": int(status),
+            "user_agent": agent or None,
+            "timestamp": self._time(time_local),
+        }
+        if rest:
+            latency = self._request_time(rest)
+            if latency is not None:
+                fields["latency"] = latency
+        return fields
+
+    def _parse_error(self, line: str) -> Optional[Dict[str, Any]]:
+        match = NGINX_ERROR.match(line)
+        if match is None:
+            return None
+        client = NGINX_ERROR_CLIENT.search(line, match.end())
+        request = NGINX_ERROR_REQUEST.search(line, match.end())
+        method, url = self._request(request[1]) if request else (None, None)
+        return {
+            "source": "nginx",
+            "log_level": NGINX_LEVELS.get(match["level"], "INFO"),
+            "source_ip": client[1] if client else None,
+            "http_method": method,
+            "http_url": url,
+        }
+
+    def _request(self, request: str) -> Tuple[Optional[str], Optional[str]]:
+        parsed = self.requests.get(request)
+        if parsed is None:
+            # "GET /path HTTP/1.1", anything else (e.g. a TLS handshake) has no method
+            parts = request.split(" ")
+            parsed = (parts[0], parts[1]) if len(parts) == 3 and parts[0].isupper() else (None, None)
+            _cache_put(self.requests, self.cache_size, request, parsed)
+        return parsed
+
+    def _time(self, time_local: str) -> Optional[datetime]:
+        # "19/Oct/2026:12:00:36 +0000": the minute and zone are cached, seconds added
+        key = time_local[:17] + time_local[20:]
+        minute = self.minutes.get(key, False)
+        if minute is False:
+            try:
+                minute = datetime.strptime(key, "%d/%b/%Y:%H:%M %z")
+            except ValueError:
+                minute = None
+            _cache_put(self.minutes, self.cache_size, key, minute)
+        seconds = time_local[18:20]
+        if minute is None or not seconds.isdigit():
+            return None
+        return minute + timedelta(seconds=int(seconds))
+
+    @staticmethod
+    def _request_time(rest: str) -> Optional[float]:
+        """Request time in ms from a trailing ``$request_time`` or ``rt=`` field"""
+        for token in rest.split(" "):
+            key, _, value = token.strip('"').rpartition("=")
+            if key and key not in REQUEST_TIME_KEYS:
+                continue
+            try:
+                return round(float(value) * 1000, 3)
+            except ValueError:
+                continue
+        return None
+
+
+class JournalParser:
+    """journald records and syslog lines from auth, system and service units.
+
+    Fields journald sends alongside the message (``PRIORITY``,
+    ``SYSLOG_IDENTIFIER``, ``_HOSTNAME``) are used when present, otherwise
+    the syslog header of the line is split; sshd authentication lines also
+    give the user and client address.
+    """
+
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        self.headers: Dict[str, Tuple[str, str]] = {}
+
+    def parse(self, line: str, log_data: Dict) -> Optional[Dict[str, Any]]:
+        fields = {}
+        body = line
+        identifier = log_data.get("SYSLOG_IDENTIFIER")
+        if identifier:
+            fields["source"] = identifier
+            fields["hostname"] = log_data.get("_HOSTNAME")
+        else:
+            header = self._header(line)
+            if header is not None:
+                fields["hostname"], fields["source"], body = header
+
+        priority = log_data.get("PRIORITY")
+        if priority is not None and str(priority).isdigit() and int(priority) < len(SYSLOG_PRIORITIES):
+            fields["log_level"] = SYSLOG_PRIORITIES[int(priority)]
+
+        if fields.get("source") == "sshd":
+            match = SSHD_AUTH.match(body)
+            if match is not None:
+                fields["event_type"] = SSHD_EVENTS[match["result"]]
+                fields["username"] = match["user"]
+                fields["source_ip"] = match["ip"]
+        return fields or None
+
+    def _header(self, line: str) -> Optional[Tuple[str, str, str]]:
+        # "Oct 19 12:00:00 host sshd[812]: text", single-digit days are space padded
+        parts = line.split(None, 5)
+        if len(parts) < 6 or len(parts[2]) != 8 or not parts[4].endswith(":"):
+            return None
+        key = parts[3] + " " + parts[4]
+        header = self.headers.get(key)
+        if header is None:
+            identifier = parts[4][:-1].split("[", 1)[0]
+            header = _cache_put(self.headers, self.cache_size, key, (parts[3], identifier))
+        return header[0], header[1], parts[5]
+
+
+class DockerParser:
+    """Container output: Docker JSON log lines are unwrapped, nginx containers
+    are parsed as nginx, other lines only give their leading log level."""
+
+    def __init__(self, nginx: NginxParser):
+        self.nginx = nginx
+
+    def parse(self, line: str, log_data: Dict) -> Optional[Dict[str, Any]]:
+        fields = {}
+        if line.startswith("{"):
+            try:
+                wrapped = json.loads(line)
+            except ValueError:
+                wrapped = None
+            if isinstance(wrapped, dict) and isinstance(wrapped.get("log"), str):
+                line = wrapped["log"].rstrip("\n")
+                fields["stream"] = wrapped.get("stream")
+
+        if line[:1].isdigit():
+            parsed = self.nginx.parse(line, log_data)
+            if parsed is not None:
+                parsed.pop("source")
+                return {**fields, **parsed}
+
+        match = LEADING_LEVEL.match(line)
+        if match is not None:
+            level = match["level"].lower()
+            fields["log_level"] = LEVEL_NAMES.get(level, level.upper())
+        return fields or None
+
+
+class LogParsers:
+    """Parsers keyed by the ``log_type`` Vector sets, filling structured fields from the raw line.
+
+    Parsed values never override a field the log already carries; values
+    without a LogModel field (e.g. ``latency``) end up in ``extra``.
+    """
+
+    def __init__(self, cache_size: int):
+        nginx = NginxParser(cache_size)
+        journal = JournalParser(cache_size)
+        self.parsers = {
+            "nginx": nginx,
+            "docker": DockerParser(nginx),
+            "journal": journal,
+            "auth": journal,
+            "system": journal,
+            "service": journal,
+        }
+        self.counts = Counter()
+
+        metrics.describe("log_processor_parsed_logs_total", "Logs handed to a log_type parser, by log_type and result")
+
+    def enrich(self, log_data: Dict) -> Dict:
+        """Return the log with the fields parsed from its message added"""
+        log_type = log_data.get("log_type")
+        parser = self.parsers.get(log_type)
+        if parser is None:
+            return log_data
+        line = log_data.get("message") or log_data.get("msg") or log_data.get("log")
+        if not isinstance(line, str):
+            return log_data
+
+        fields = parser.parse(line, log_data)
+        if not fields:
+            self.counts[log_type, "unmatched"] += 1
+            return log_data
+        self.counts[log_type, "parsed"] += 1
+
+        enriched = dict(log_data)
+        for field, value in fields.items():
+            if value is None or log_data.get(field):
+                continue
+            aliases = FIELD_ALIASES.get(field)
+            if aliases is not None and any(log_data.get(key) for key in aliases):
+                continue
+            enriched[field] = value
+        return enriched
+
+    def publish_metrics(self):
+        """Move the counts of the last batch to the metrics registry"""
+        for (log_type, result), count in self.counts.items():
+            metrics.inc("log_processor_parsed_logs_total", count, {"log_type": log_type, "result": result})
+        self.counts.clear()
@@ -0,0 +1,126 @@
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+
+WILDCARD = "<*>"
+
+# Number of leading tokens used to pick a leaf in the prefix tree
+TREE_DEPTH = 2
+# Minimum share of matching tokens for a message to join an existing cluster
+SIMILARITY_THRESHOLD = 0.5
+MAX_CLUSTERS_PER_LEAF = 100
+MAX_CLUSTERS = 50_000
+
+
+class TemplateMatch(NamedTuple):
+    template_id: int
+    template: str
+    params: List[str]
+    is_new: bool
+
+
+def template_id_for(template: str) -> int:
+    """Stable signed 64-bit id, identical across workers for the same template"""
+    digest = hashlib.blake2b(template.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _has_digit(token: str) -> bool:
+    return any(c.isdigit() for c in token)
+
+
+class _Cluster:
+    __slots__ = ("tokens", "template", "template_id")
+
+    def __init__(self, tokens: List[str]):
+        self.tokens = tokens
+        self.template = " ".join(tokens)
+        self.template_id = template_id_for(self.template)
+
+
+class TemplateMiner:
+    """Drain-style online log template extraction.
+
+    Messages are split on single spaces (so joining the tokens back gives the
+    exact original), routed through a fixed-depth prefix tree keyed by token
+    count and leading tokens, and merged into the most similar cluster of the
+    leaf. Positions that differ between cluster members become ``<*>`` and
+    their values are returned as parameters.
+    """
+
+    def __init__(self):
+        self.leaves: Dict[tuple, List[_Cluster]] = {}
+        self.known_ids: "OrderedDict[int, None]" = OrderedDict()
+        self.cluster_count = 0
+
+    def _leaf_key(self, tokens: List[str]) -> tuple:
+        prefix = tuple(
+            WILDCARD if _has_digit(token) else token
+            for token in tokens[:TREE_DEPTH]
+        )
+        return (len(tokens),) + prefix
+
+    @staticmethod
+    def _similarity(template_tokens: List[str], tokens: List[str]) -> float:
+        same = sum(
+            1 for template_token, token in zip(template_tokens, tokens)
+            if template_token == token or template_token == WILDCARD
+        )
+        return same / len(tokens)
+
+    def add_template(self, template: str):
+        """Seed the miner with a template already stored in the database"""
+        tokens = template.split(" ")
+        leaf = self.leaves.setdefault(self._leaf_key(tokens), [])
+        leaf.append(_Cluster(tokens))
+        self.cluster_count += 1
+        self.known_ids[template_id_for(template)] = None
+
+    def match(self, message: Optional[str]) -> Optional[TemplateMatch]:
+        """Return the template and parameters for a message, or None if it cannot be templated"""
+        if not message or WILDCARD in message:
+            return None
+
+        tokens = message.split(" ")
+        leaf = self.leaves.setdefault(self._leaf_key(tokens), [])
+
+        best, best_score = None, 0.0
+        for cluster in leaf:
+            score = self._similarity(cluster.tokens, tokens)
+            if score > best_score:
+                best, best_score = cluster, score
+
+        if best is None or best_score < SIMILARITY_THRESHOLD:
+            best = _Cluster([WILDCARD if _has_digit(token) else token for token in tokens])
+            leaf.append(best)
+            self.cluster_count += 1
+            if len(leaf) > MAX_CLUSTERS_PER_LEAF:
+                leaf.pop(0)
+                self.cluster_count -= 1
+        else:
+            merged = [
+                template_token if template_token == token else WILDCARD
+                for template_token, token in zip(best.tokens, tokens)
+            ]
+            if merged != best.tokens:
+                best.tokens = merged
+                best.template = " ".join(merged)
+                best.template_id = template_id_for(best.template)
+
+        if self.cluster_count > MAX_CLUSTERS:
+            self._reset()
+
+        params = [token for template_token, token in zip(best.tokens, tokens) if template_token == WILDCARD]
+        is_new = best.template_id not in self.known_ids
+        return TemplateMatch(best.template_id, best.template, params, is_new)
+
+    def mark_known(self, template_id: int):
+        """Record that a template id is persisted so it is not written again"""
+        self.known_ids[template_id] = None
+        if len(self.known_ids) > MAX_CLUSTERS * 2:
+            self.known_ids.popitem(last=False)
+
+    def _reset(self):
+        # Clusters only guide future matching; stored templates stay valid
+        self.leaves.clear()
+        self.cluster_count = 0
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Tuple
+
+from app.models.log_model import LogModel
+from app.monitoring.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Wait between rounds while every queued tenant is over its rate limit
+RATE_LIMITED_WAIT_SEC = 0.01
+
+
+def parse_tenant_map(value: str) -> Dict[str, float]:
+    """Parse ``tenant=value`` pairs separated by commas, e.g. ``acme=3,globex=0.5``"""
+    result = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        tenant, sep, number = item.partition("=")
+        if not sep:
+            raise ValueError(f"Expected tenant=value, got '{item.strip()}'")
+        result[tenant.strip()] = float(number)
+    return result
+
+
+class TenantScheduler:
+    """Weighted fair queueing of stored logs across tenants ahead of fact generation.
+
+    Logs are queued per tenant and dequeued with deficit round robin: every
+    round each backlogged tenant is credited ``quantum * weight`` logs. A
+    tenant with a token-bucket rate limit is additionally held to that many
+    logs per second. A tenant whose queue reaches ``max_per_tenant`` has its
+    new logs shed from fact generation (they are already stored), and intake
+    waits while ``max_pending`` logs are queued in total, so a flooding tenant
+    only delays its own facts.
+    """
+
+    def __init__(self, quantum: int, weights: Dict[str, float], rate_limits: Dict[str, float],
+                 default_rate_limit: float, max_pending: int, max_per_tenant: int):
+        for tenant, weight in weights.items():
+            # A tenant without credit would never be dequeued
+            if weight <= 0:
+                raise ValueError(f"Tenant weight must be positive, got {tenant}={weight:g}")
+        self.quantum = quantum
+        self.weights = weights
+        self.rate_limits = rate_limits
+        self.default_rate_limit = default_rate_limit
+        self.max_pending = max_pending
+        self.max_per_tenant = max_per_tenant
+
+        self.queues: Dict[str, Deque[Tuple[float, LogModel]]] = {}
+        self.active: Deque[str] = deque()
+        self.deficits: Dict[str, float] = {}
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+        self.pending = 0
+        self.closed = False
+        self.has_items = asyncio.Event()
+        self.has_space = asyncio.Event()
+        self.has_space.set()
+
+        metrics.describe("log_processor_tenant_queued", "Stored logs waiting for fact generation per tenant")
+        metrics.describe("log_processor_tenant_lag_seconds", "Age of the oldest log waiting per tenant")
+        metrics.describe("log_processor_tenant_logs_total", "Logs passed to fact generation per tenant")
+        metrics.describe("log_processor_tenant_shed_total", "Logs skipped by fact generation because the tenant queue was full")
+
+    def weight(self, tenant: str) -> float:
+        return self.weights.get(tenant, 1.0)
+
+    def rate_limit(self, tenant: str) -> float:
+        return self.rate_limits.get(tenant, self.default_rate_limit)
+
+    async def put_many(self, logs: List[LogModel]):
+        """Queue stored logs, waiting while the scheduler is full"""
+        shed = Counter()
+        for log in logs:
+            while self.pending >= self.max_pending:
+                self.has_space.clear()
+                await self.has_space.wait()
+
+            tenant = log.tenant or "default"
+            queue = self.queues.get(tenant)
+            if queue is None:
+                queue = self.queues[tenant] = deque()
+            if len(queue) >= self.max_per_tenant:
+                shed[tenant] += 1
+                continue
+            if not queue:
+                self.active.append(tenant)
+                self.deficits[tenant] = 0.0
+            queue.append((time.monotonic(), log))
+            self.pending += 1
+            self.has_items.set()
+
+        for tenant, count in shed.items():
+            metrics.inc("log_processor_tenant_shed_total", count, {"tenant": tenant})
+            logger.warning("Tenant %s queue is full, %d logs skipped fact generation", tenant, count)
+
+    def close(self):
+        """Make get_batch hand out everything still queued, then return empty batches"""
+        self.closed = True
+        self.has_items.set()
+
+    async def get_batch(self) -> List[LogModel]:
+        """Wait for the next round of logs"""
+        while True:
+            if self.closed:
+                return self.drain()
+            batch = self.next_round()
+            if batch:
+                return batch
+            if self.pending == 0:
+                self.has_items.clear()
+                await self.has_items.wait()
+            else:
+                await asyncio.sleep(RATE_LIMITED_WAIT_SEC)
+
+    def next_round(self) -> List[LogModel]:
+        """Visit every backlogged tenant once and take what its deficit and rate limit allow"""
+        batch = []
+        taken = Counter()
+        now = time.monotonic()
+        for _ in range(len(self.active)):
+            tenant = self.active.popleft()
+            queue = self.queues[tenant]
+            credit = self.quantum * self.weight(tenant)
+            # Unused credit is capped so rate-limited tenants cannot bank a burst
+            self.deficits[tenant] = min(self.deficits[tenant] + credit, 2 * credit)
+            allowed = min(int(self.deficits[tenant]), len(queue), self._tokens(tenant, now))
+
+            for _ in range(allowed):
+                batch.append(queue.popleft()[1])
+            if allowed:
+                taken[tenant] = allowed
+                self.deficits[tenant] -= allowed
+                self._spend(tenant, allowed)
+
+            if queue:
+                self.active.append(tenant)
+            else:
+                self.deficits[tenant] = 0.0
+
+        self.pending -= len(batch)
+        if self.pending < self.max_pending:
+            self.has_space.set()
+        self._publish(taken, now)
+        return batch
+
+    def drain(self) -> List[LogModel]:
+        """Remove every queued log regardless of deficits and rate limits"""
+        batch = [log for tenant in self.active for _, log in self.queues[tenant]]
+        for tenant in self.active:
+            metrics.inc("log_processor_tenant_logs_total", len(self.queues[tenant]), {"tenant": tenant})
+            self.queues[tenant].clear()
+        self.active.clear()
+        self.pending = 0
+        self.has_space.set()
+        self._publish(Counter(), time.monotonic())
+        return batch
+
+    def _tokens(self, tenant: str, now: float) -> int:
+        rate = self.rate_limit(tenant)
+        if rate <= 0:
+            return self.max_per_tenant
+        # Burst of one second worth of logs
+        capacity = max(rate, 1.0)
+        tokens, last = self.buckets.get(tenant, (capacity, now))
+        tokens = min(capacity, tokens + (now - last) * rate)
+        self.buckets[tenant] = (tokens, now)
+        return int(tokens)
+
+    def _spend(self, tenant: str, count: int):
+        if tenant in self.buckets:
+            tokens, last = self.buckets[tenant]
+            self.buckets[tenant] = (tokens - count, last)
+
+    def _publish(self, taken: Counter, now: float):
+        for tenant, count in taken.items():
+            metrics.inc("log_processor_tenant_logs_total", count, {"tenant": tenant})
+        for tenant, queue in self.queues.items():
+            labels = {"tenant": tenant}
+            metrics.set_gauge("log_processor_tenant_queued", len(queue), labels)
+            metrics.set_gauge("log_processor_tenant_lag_seconds", round(now - queue[0][0], 3) if queue else 0, labels)
@@ -0,0 +1,244 @@
+import asyncio
+import bisect
+import json
+import re
+import time
+from collections import Counter, deque
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import unquote
+
+from app.models.fact_model import Fact
+from app.models.log_model import LogModel
+from app.monitoring.http_server import HttpServer, json_response
+from app.monitoring.metrics import metrics
+from app.processors.fact_policy import fact_policy
+from app.processors.facts_generator import FREQUENCY_WINDOW_SEC
+from app.processors.latency_sketch import LATENCY_WINDOW_SEC
+from app.processors.template_miner import WILDCARD
+
+# Minutes of traffic the top templates and client addresses are counted over
+TOP_WINDOW_MINUTES = 5
+# Distinct templates or addresses counted per source and minute, later ones are ignored
+MAX_KEYS_PER_MINUTE = 1000
+MAX_TEMPLATE_CHARS = 200
+# Sources encoded between two yields to the event loop while publishing
+PUBLISH_CHUNK = 200
+# Most sources returned by one bulk or prefix query
+MAX_QUERY_SOURCES = 1000
+# Share of the sources evicted (least recently seen first) once max_sources is exceeded
+EVICT_RATIO = 0.1
+
+TOKEN_WITH_DIGIT = re.compile(r"[^ ]*\d[^ ]*")
+
+
+def _count(counter: Counter, key: Optional[str]):
+    if key and (key in counter or len(counter) < MAX_KEYS_PER_MINUTE):
+        counter[key] += 1
+
+
+class _SourceWindow:
+    __slots__ = ("fact", "last_seen", "seen_at", "minutes")
+
+    def __init__(self):
+        self.fact: Optional[Fact] = None
+        self.last_seen = None
+        self.seen_at = 0.0
+        # (minute, template counts, client address counts), oldest first
+        self.minutes = deque(maxlen=TOP_WINDOW_MINUTES)
+
+    def bucket(self, minute: int):
+        if not self.minutes or self.minutes[-1][0] != minute:
+            self.minutes.append((minute, Counter(), Counter()))
+        return self.minutes[-1]
+
+
+class WindowState:
+    """Live per-source window state for the ``/state`` endpoints.
+
+    The ingest loop records the fact of every log; every ``publish_ms`` a
+    background task encodes the sources touched since to JSON and swaps in a
+    new snapshot dict. Readers only ever see a published snapshot, so a
+    request is a dict lookup and never waits for (or holds up) a batch.
+
+    Top templates are the Drain templates matched when the log was stored
+    with template compression; other logs (compression off, or shed rows)
+    fall back to the message with its digit tokens masked.
+
+    Counts and latencies come from the latest fact of a source. A source
+    that goes quiet is republished as its windows run out, so its entry
+    turns stale (no logs in the last minute), loses its latencies and
+    eventually reports it is silent.
+    """
+
+    def __init__(self, top_n: int, max_sources: int, publish_ms: float):
+        self.top_n = top_n
+        self.max_sources = max_sources
+        self.publish_interval = publish_ms / 1000
+        # Idle ages after which a quiet source is republished, each with its
+        # sources in the order they were last recorded
+        self.refresh_after = sorted({
+            FREQUENCY_WINDOW_SEC, LATENCY_WINDOW_SEC, TOP_WINDOW_MINUTES * 60,
+            fact_policy.current.policy.silence_threshold_minutes * 60,
+        })
+        self.idle: List[Dict[str, float]] = [{} for _ in self.refresh_after]
+        self.live: Dict[str, _SourceWindow] = {}
+        self.dirty = set()
+        self.published_at = None
+        # Published state: JSON of each source and the sorted source names
+        self.snapshot: Dict[str, bytes] = {}
+        self.names: List[str] = []
+
+        metrics.describe("log_processor_window_state_sources", "Sources with live window state")
+
+    def record(self, log: LogModel, fact: Fact):
+        now = time.time()
+        window = self.live.get(fact.source)
+        if window is None:
+            window = self.live[fact.source] = _SourceWindow()
+        window.fact = fact
+        window.last_seen = log.timestamp
+        window.seen_at = now
+
+        for idle in self.idle:
+            idle.pop(fact.source, None)
+            idle[fact.source] = now
+
+        _, templates, addresses = window.bucket(int(now // 60))
+        _count(templates, self.template_of(log))
+        _count(addresses, log.source_ip)
+        self.dirty.add(fact.source)
+
+    def template_of(self, log: LogModel) -> Optional[str]:
+        if log._template is not None:
+            return log._template[:MAX_TEMPLATE_CHARS]
+        if not log.message:
+            return None
+        return TOKEN_WITH_DIGIT.sub(WILDCARD, log.message[:MAX_TEMPLATE_CHARS])
+
+    async def publish(self):
+        """Swap in a snapshot with the sources recorded, or gone idle, since the last one"""
+        self._expire_idle(time.time())
+        if not self.dirty:
+            return
+        dirty, self.dirty = self.dirty, set()
+
+        snapshot = dict(self.snapshot)
+        for i, source in enumerate(dirty, 1):
+            window = self.live.get(source)
+            if window is None:
+                # Evicted by an earlier publish after it was recorded
+                continue
+            snapshot[source] = json.dumps(self._entry(source, window)).encode("utf-8")
+            if i % PUBLISH_CHUNK == 0:
+                # Let batches run while many sources are encoded, readers keep the previous snapshot
+                await asyncio.sleep(0)
+        names = self.names
+        if len(snapshot) != len(names):
+            if len(snapshot) > self.max_sources:
+                self._evict(snapshot)
+            names = sorted(snapshot)
+        self.snapshot, self.names = snapshot, names
+        self.published_at = time.time()
+        metrics.set_gauge("log_processor_window_state_sources", len(snapshot))
+
+    def _expire_idle(self, now: float):
+        for age, idle in zip(self.refresh_after, self.idle):
+            while idle:
+                source, seen_at = next(iter(idle.items()))
+                if now - seen_at < age:
+                    break
+                del idle[source]
+                self.dirty.add(source)
+
+    def _evict(self, snapshot: Dict[str, bytes]):
+        by_age = sorted(self.live, key=lambda source: self.live[source].seen_at)
+        for source in by_age[:len(by_age) - int(self.max_sources * (1 - EVICT_RATIO))]:
+            del self.live[source]
+            snapshot.pop(source, None)
+            for idle in self.idle:
+                idle.pop(source, None)
+
+    def _entry(self, source: str, window: _SourceWindow) -> Dict:
+        fact = window.fact
+        now = time.time()
+        idle = now - window.seen_at
+        minute = int(now // 60)
+        templates, addresses = Counter(), Counter()
+        for bucket_minute, bucket_templates, bucket_addresses in window.minutes:
+            if minute - bucket_minute < TOP_WINDOW_MINUTES:
+                templates.update(bucket_templates)
+                addresses.update(bucket_addresses)
+        return {
+            "source": source,
+            "last_seen": window.last_seen.isoformat(),
+            "updated_at": round(window.seen_at, 3),
+            "stale": idle >= FREQUENCY_WINDOW_SEC,
+            "log_level": fact.log_level,
+            "error_count": fact.recent_error_count,
+            "warn_count": fact.recent_warn_count,
+            "repeated_error_count": fact.repeated_error_count,
+            "unauthorized_count": fact.unauthorized_count,
+            "frequency_last_minute": fact.log_frequency_last_minute if idle < FREQUENCY_WINDOW_SEC else 0,
+            "is_silent": fact.is_silent or idle >= fact_policy.current.policy.silence_threshold_minutes * 60,
+            "potential_scraper": fact.potential_scraper,
+            "latency_p50": fact.latency_p50 if idle < LATENCY_WINDOW_SEC else None,
+            "latency_p95": fact.latency_p95 if idle < LATENCY_WINDOW_SEC else None,
+            "latency_p99": fact.latency_p99 if idle < LATENCY_WINDOW_SEC else None,
+            "top_templates": [{"template": t, "count": n} for t, n in templates.most_common(self.top_n)],
+            "top_ips": [{"ip": ip, "count": n} for ip, n in addresses.most_common(self.top_n)],
+        }
+
+    async def run(self):
+        """Background task publishing a snapshot every publish_ms"""
+        while True:
+            await asyncio.sleep(self.publish_interval)
+            await self.publish()
+
+    def get(self, source: str) -> Optional[bytes]:
+        return self.snapshot.get(source)
+
+    def many(self, sources: Iterable[str]) -> bytes:
+        """JSON object of the requested sources that have state"""
+        snapshot = self.snapshot
+        return self._object((source, snapshot.get(source)) for source in sources)
+
+    def with_prefix(self, prefix: str, limit: int) -> bytes:
+        """JSON object of up to ``limit`` sources starting with ``prefix``, in name order"""
+        snapshot, names = self.snapshot, self.names
+        start = bisect.bisect_left(names, prefix)
+        matched = []
+        for name in names[start:start + limit]:
+            if not name.startswith(prefix):
+                break
+            matched.append((name, snapshot.get(name)))
+        return self._object(matched)
+
+    def _object(self, entries) -> bytes:
+        parts = [json.dumps(source).encode("utf-8") + b":" + entry for source, entry in entries if entry is not None]
+        return b'{"as_of":%s,"sources":{%s}}' % (json.dumps(self.published_at).encode("utf-8"), b",".join(parts))
+
+    def register_routes(self, server: HttpServer):
+        async def sources(query, body):
+            if body:
+                payload = json.loads(body)
+                requested = payload.get("sources") if isinstance(payload, dict) else None
+                if not isinstance(requested, list):
+                    raise ValueError('expected {"sources": [...]}')
+            else:
+                requested = query.get("source")
+            if requested is not None:
+                if len(requested) > MAX_QUERY_SOURCES:
+                    raise ValueError(f"at most {MAX_QUERY_SOURCES} sources per query")
+                return 200, "application/json", self.many(requested)
+            limit = min(int(query.get("limit", ["100"])[0]), MAX_QUERY_SOURCES)
+            return 200, "application/json", self.with_prefix(query.get("prefix", [""])[0], limit)
+
+        async def source(query, body):
+            entry = self.get(unquote(query["_path"][0]))
+            if entry is None:
+                return json_response({"error": "no state for this source"}, 404)
+            return 200, "application/json", entry
+
+        server.route("GET", "/state/sources", sources)
+        server.route("POST", "/state/sources", sources)
+        server.route("GET", "/state/sources/", source)
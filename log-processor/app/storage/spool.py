@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from app.config import settings
+from app.models.log_model import LogModel
+from app.monitoring.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Every record is: payload length, crc32 of the payload, JSON payload
+RECORD_HEADER = struct.Struct("<II")
+SEGMENT_SUFFIX = ".seg"
+OFFSET_SUFFIX = ".offset"
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+class DiskSpool:
+    """Append-only spool of fixed-size segment files on local disk.
+
+    Records that could not be written to their sink are appended to the
+    active segment; once a segment is full (or sealed by the drainer) it is
+    read back with mmap and deleted after every record was replayed.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int, max_bytes: int,
+                 fsync: str = "interval", fsync_interval_sec: float = 1.0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unsupported spool fsync policy: {fsync}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.fsync_interval_sec = fsync_interval_sec
+
+        self.active_file = None
+        self.active_path = None
+        self.active_size = 0
+        self.last_fsync = time.monotonic()
+        self.last_append = 0.0
+        # Appends, seals and removals run one at a time, in worker threads
+        self.lock = asyncio.Lock()
+
+        metrics.describe("log_processor_spool_write_failures_total", "Records lost because the spool could not be written")
+
+        segments = self.segments()
+        self.next_sequence = int(segments[-1].stem) + 1 if segments else 0
+        self.total_bytes = sum(path.stat().st_size for path in segments)
+        if segments:
+            logger.warning("Spool contains %d segments (%d bytes) to replay", len(segments), self.total_bytes)
+
+    def segments(self) -> List[Path]:
+        return sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+
+    def sealed_segments(self) -> List[Path]:
+        return [path for path in self.segments() if path != self.active_path]
+
+    def is_empty(self) -> bool:
+        return self.total_bytes == 0
+
+    async def append(self, kind: str, payload: dict):
+        await self.append_many(kind, [payload])
+
+    async def append_many(self, kind: str, payloads: List[dict]):
+        """Append records from a worker thread, the writes and fsync never block the event loop"""
+        if not payloads:
+            return
+        async with self.lock:
+            await asyncio.to_thread(self._append_records, kind, payloads)
+
+    def _append_records(self, kind: str, payloads: List[dict]):
+        for payload in payloads:
+            data = json.dumps({"kind": kind, "payload": payload}, default=str).encode("utf-8")
+            record = RECORD_HEADER.pack(len(data), zlib.crc32(data)) + data
+            self._make_room(len(record))
+            if self.active_file is None or self.active_size + len(record) > self.segment_bytes:
+                self._roll()
+            self.active_file.write(record)
+            self.active_size += len(record)
+            self.total_bytes += len(record)
+
+        self.active_file.flush()
+        now = time.monotonic()
+        self.last_append = now
+        if self.fsync == "always" or (self.fsync == "interval" and now - self.last_fsync >= self.fsync_interval_sec):
+            os.fsync(self.active_file.fileno())
+            self.last_fsync = now
+
+    def _make_room(self, size: int):
+        """Drop the oldest segments when the disk budget would be exceeded"""
+        while self.total_bytes + size > self.max_bytes:
+            sealed = self.sealed_segments()
+            if not sealed:
+                if self.active_file is None:
+                    return
+                # Everything left is in the active segment: seal it so it can be dropped too
+                self.seal()
+                continue
+            logger.error("Spool disk budget exceeded, dropping oldest segment %s", sealed[0].name)
+            self._remove_segment(sealed[0])
+
+    def _roll(self):
+        self.seal()
+        self.active_path = self.directory / f"{self.next_sequence:016d}{SEGMENT_SUFFIX}"
+        self.next_sequence += 1
+        self.active_file = open(self.active_path, "ab")
+        self.active_size = 0
+
+    def seal(self):
+        """Close the active segment so it can be drained"""
+        if self.active_file is not None:
+            self.active_file.flush()
+            if self.fsync != "never":
+                os.fsync(self.active_file.fileno())
+            self.active_file.close()
+        self.active_file = None
+        self.active_path = None
+        self.active_size = 0
+
+    async def seal_if_idle(self, idle_sec: float):
+        """Seal the active segment once nothing was appended for idle_sec"""
+        async with self.lock:
+            if self.active_file is not None and time.monotonic() - self.last_append >= idle_sec:
+                await asyncio.to_thread(self.seal)
+
+    def read_segment(self, path: Path, start: int = 0) -> Iterator[Tuple[int, str, dict]]:
+        """Yield (end offset, kind, payload) for every intact record after start"""
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= start:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                position = start
+                while position + RECORD_HEADER.size <= size:
+                    length, crc = RECORD_HEADER.unpack_from(mm, position)
+                    end = position + RECORD_HEADER.size + length
+                    if end > size:
+                        logger.warning("Truncated record at the end of spool segment %s", path.name)
+                        return
+                    data = mm[position + RECORD_HEADER.size:end]
+                    if zlib.crc32(data) != crc:
+                        logger.error("Corrupted record in spool segment %s at offset %d", path.name, position)
+                        return
+                    record = json.loads(data)
+                    yield end, record["kind"], record["payload"]
+                    position = end
+
+    def read_offset(self, path: Path) -> int:
+        offset_path = path.with_suffix(OFFSET_SUFFIX)
+        try:
+            return int(offset_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def write_offset(self, path: Path, offset: int):
+        path.with_suffix(OFFSET_SUFFIX).write_text(str(offset))
+
+    async def remove_segment(self, path: Path):
+        async with self.lock:
+            self._remove_segment(path)
+
+    def _remove_segment(self, path: Path):
+        try:
+            self.total_bytes -= path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        path.with_suffix(OFFSET_SUFFIX).unlink(missing_ok=True)
+        self.total_bytes = max(self.total_bytes, 0)
+
+    async def close(self):
+        async with self.lock:
+            self.seal()
+
+
+class SpoolDrainer:
+    """Background task replaying spooled records in bulk once the sinks recover"""
+
+    def __init__(self, spool: DiskSpool, insert_logs_fn, send_fact_fn, paused_fn=None):
+        self.spool = spool
+        # Replay is held back while this returns True, e.g. under overload
+        self.paused_fn = paused_fn
+        self.insert_logs_fn = insert_logs_fn
+        self.send_fact_fn = send_fact_fn
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(settings.spool_drain_interval_sec)
+            if self.spool.is_empty() or (self.paused_fn and self.paused_fn()):
+                continue
+            try:
+                await self.drain()
+            except Exception as e:
+                logger.warning("Spool drain paused, sink still unavailable: %s", e)
+
+    async def drain(self):
+        # While the sink is down records keep coming in, so the active
+        # segment is only replayed once appends have stopped
+        await self.spool.seal_if_idle(settings.spool_drain_interval_sec)
+        for path in self.spool.sealed_segments():
+            await self._drain_segment(path)
+            await self.spool.remove_segment(path)
+            logger.info("Spool segment %s replayed", path.name)
+
+    async def _drain_segment(self, path: Path):
+        logs, offset = [], self.spool.read_offset(path)
+        for end, kind, payload in self.spool.read_segment(path, offset):
+            if kind == "log":
+                logs.append(payload)
+                if len(logs) >= settings.spool_drain_batch_size:
+                    await self._insert(logs)
+                    logs = []
+                    self.spool.write_offset(path, end)
+            elif kind == "fact":
+                if logs:
+                    await self._insert(logs)
+                    logs = []
+                if not await self.send_fact_fn(payload):
+                    raise RuntimeError("fact sink unavailable")
+                self.spool.write_offset(path, end)
+        if logs:
+            await self._insert(logs)
+
+    async def _insert(self, payloads: List[dict]):
+        await self.insert_logs_fn([log_from_spool(payload) for payload in payloads])
+
+
+def log_to_spool(log: LogModel) -> dict:
+    return log.model_dump(mode="json")
+
+
+def log_from_spool(payload: dict) -> LogModel:
+    """Rebuild a LogModel from its spooled form without re-running the input validators"""
+    data = dict(payload)
+    data["timestamp"] = datetime.fromisoformat(data["timestamp"])
+    return LogModel.model_construct(**data)
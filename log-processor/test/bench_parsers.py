@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Log Parser Benchmark
+====================
+
+Generates realistic nginx combined-format access lines (a skewed mix of client
+addresses, paths, user agents and status codes, one second of traffic per
+--rate lines) and measures the nginx parser of the log-processor with and
+without its parse cache, and the cost it adds to building a LogModel.
+
+Run from the log-processor directory:
+
+Usage:
+    python test/bench_parsers.py [--lines LINES] [--rate RATE] [--cache-size SIZE] [--repeat REPEAT]
+
+Options:
+    --lines LINES      Number of generated lines (default: 200000)
+    --rate RATE        Lines per second of simulated traffic (default: 500)
+    --cache-size SIZE  Parse cache entries per log type (default: 10000)
+    --repeat REPEAT    Runs per measurement, the best one is reported (default: 3)
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models.log_model import LogModel  # noqa: E402
+from app.processors.log_parsers import NGINX_ACCESS, LogParsers, NginxParser  # noqa: E402
+
+PATHS = [
+    "/", "/index.html", "/favicon.ico", "/static/css/main.css", "/static/js/app.js",
+    "/api/health", "/api/v1/products", "/api/v1/cart", "/login", "/logout", "/search",
+]
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_6) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.6 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:131.0) Gecko/20100101 Firefox/131.0",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+    "kube-probe/1.30",
+    "curl/8.5.0",
+    "python-requests/2.32.3",
+]
+STATUSES = [200] * 80 + [304] * 8 + [301, 302] * 2 + [404] * 4 + [403, 499, 500, 502]
+
+
+def generate_lines(count: int, rate: int) -> list:
+    """Combined-format lines followed by $request_time, most traffic from few clients and paths"""
+    rng = random.Random(42)
+    clients = [f"203.0.113.{i}" for i in range(1, 60)] + [f"198.51.100.{i}" for i in range(1, 200)]
+    start = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+    lines = []
+    for i in range(count):
+        ts = (start + timedelta(seconds=i // rate)).strftime("%d/%b/%Y:%H:%M:%S %z")
+        if rng.random() < 0.2:
+            path = f"/api/v1/products/{rng.randint(1, 5000)}?page={rng.randint(1, 20)}"
+        else:
+            path = PATHS[min(int(rng.expovariate(0.4)), len(PATHS) - 1)]
+        method = "POST" if path in ("/login", "/api/v1/cart") and rng.random() < 0.5 else "GET"
+        client = clients[min(int(rng.expovariate(0.05)), len(clients) - 1)]
+        user = "alice" if rng.random() < 0.05 else "-"
+        referer = "-" if rng.random() < 0.6 else "https://shop.example.com/"
+        lines.append(
+            f'{client} - {user} [{ts}] "{method} {path} HTTP/1.1" {rng.choice(STATUSES)} '
+            f'{rng.randint(0, 60000)} "{referer}" "{rng.choice(USER_AGENTS)}" {rng.uniform(0.001, 0.8):.3f}'
+        )
+    return lines
+
+
+def measure(name: str, fn, items: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - started)
+    print(f"  {name:<34} {len(items) / best:>12,.0f} lines/s  {best / len(items) * 1e6:7.2f} µs/line")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the log_type parsers on nginx combined-format lines")
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--rate", type=int, default=500)
+    parser.add_argument("--cache-size", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    lines = generate_lines(args.lines, args.rate)
+    print(f"🧪 {len(lines)} nginx lines, e.g.\n  {lines[0]}")
+
+    cached = NginxParser(args.cache_size)
+    uncached = NginxParser(0)
+    unmatched = sum(1 for line in lines if cached.parse(line, {}) is None)
+    print(f"  Unmatched lines: {unmatched}")
+    print(f"  Cached request lines: {len(cached.requests)}, time prefixes: {len(cached.minutes)}")
+
+    print("\n⏱️  Parsing")
+    measure("regex match only", NGINX_ACCESS.match, lines, args.repeat)
+    without_cache = measure("parser without cache", lambda line: uncached.parse(line, {}), lines, args.repeat)
+    with_cache = measure("parser with cache", lambda line: cached.parse(line, {}), lines, args.repeat)
+    print(f"  Cache speedup: {without_cache / with_cache:.2f}x")
+
+    print("\n⏱️  Ingest (raw log to LogModel)")
+    records = [{"log_type": "nginx", "message": line, "timestamp": "2026-10-19T12:00:00Z"} for line in lines]
+    parsers = LogParsers(args.cache_size)
+    plain = measure("LogModel only", lambda record: LogModel(**record), records, args.repeat)
+    enriched = measure("parsers + LogModel", lambda record: LogModel(**parsers.enrich(record)), records, args.repeat)
+    print(f"  Parsing overhead: {(enriched - plain) / len(records) * 1e6:.2f} µs/line")
+
+
+if __name__ == "__main__":
+    main()
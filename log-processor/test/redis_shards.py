@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Redis Shard Distribution Check
+==============================
+
+Writes the per-source keys of many synthetic sources through the log-processor
+cache layer and reports how evenly they are spread over the Redis nodes, then
+how many sources would move if a node were added to the consistent-hash ring.
+
+Start the nodes with docker/docker-compose.redis-shards.yml, then run from the
+log-processor directory:
+
+Usage:
+    python test/redis_shards.py [--nodes NODES] [--sources SOURCES] [--add-node NODE] [--dry-run]
+
+Options:
+    --nodes NODES      Comma-separated host:port list (default: localhost:6380,localhost:6381,localhost:6382)
+    --sources SOURCES  Number of synthetic sources (default: 10000)
+    --add-node NODE    Node added for the rebalancing check (default: localhost:6383)
+    --dry-run          Only compute the distribution from the ring, without Redis
+"""
+
+import argparse
+import statistics
+import sys
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.processors.cache import RedisShards, parse_nodes  # noqa: E402
+
+KEY_PREFIX = "shard_check"
+
+
+def report(title: str, counts: Counter, nodes: list):
+    total = sum(counts.values())
+    print(f"\n📊 {title}")
+    for node in nodes:
+        share = counts[node] / total if total else 0
+        print(f"  {node:<24} {counts[node]:>8} keys  {share:6.1%}")
+    values = [counts[node] for node in nodes]
+    if len(values) > 1 and total:
+        spread = statistics.pstdev(values) / statistics.mean(values)
+        print(f"  Coefficient of variation: {spread:.3f} (ideal share {1 / len(nodes):.1%})")
+
+
+def write_keys(shards: RedisShards, sources: list) -> Counter:
+    """Write one key per source with one pipeline per node, then count keys on every node"""
+    now = datetime.now(timezone.utc).isoformat()
+    for start in range(0, len(sources), 1000):
+        chunk = sources[start:start + 1000]
+        shards.execute_grouped([
+            (source, lambda pipe, source=source: pipe.set(shards.key(KEY_PREFIX, source), now, ex=600))
+            for source in chunk
+        ])
+    counts = Counter()
+    for node, client in shards.clients.items():
+        counts[node] = sum(1 for _ in client.scan_iter(f"{KEY_PREFIX}:*", count=1000))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the Redis shard distribution of per-source keys")
+    parser.add_argument("--nodes", default="localhost:6380,localhost:6381,localhost:6382")
+    parser.add_argument("--sources", type=int, default=10000)
+    parser.add_argument("--add-node", default="localhost:6383")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    nodes = parse_nodes(args.nodes)
+    sources = [f"service-{i:06d}" for i in range(args.sources)]
+    shards = RedisShards(nodes)
+
+    if args.dry_run:
+        counts = Counter(shards.node_for(source) for source in sources)
+    else:
+        counts = write_keys(shards, sources)
+    report(f"{args.sources} sources over {len(nodes)} nodes", counts, nodes)
+
+    before = {source: shards.node_for(source) for source in sources}
+    shards.ring.add(args.add_node)
+    moved = [source for source in sources if shards.node_for(source) != before[source]]
+    wrong = [source for source in moved if shards.node_for(source) != args.add_node]
+    print(f"\n➕ Adding {args.add_node}")
+    print(f"  Sources moved: {len(moved)} ({len(moved) / len(sources):.1%}, ideal {1 / (len(nodes) + 1):.1%})")
+    print(f"  Sources moved between existing nodes: {len(wrong)}")
+    report(f"{args.sources} sources over {len(nodes) + 1} nodes", Counter(shards.node_for(s) for s in sources), nodes + [args.add_node])
+
+
+if __name__ == "__main__":
+    main()